@@ -0,0 +1,178 @@
+# Microbenchmarks for the hot loops, usage: python bench.py [name [args ...]] (default: all)
+import random
+from io import BytesIO
+from os import path
+from sys import argv
+from timeit import repeat
+from time import perf_counter
+from typing import Callable, Any
+from struct import Struct
+from yuri.fileformat import Rdr, IOpA, IOpB, IOpV, Tyq, TIns, Typ, VScope, VScoEx, YSVR, Var, YSLB, Lbl, \
+    YSCM, YSTL, YSTB
+from yuri.decompiler import YDecYuri, YDecYuris
+from yuri.fileformat.common import LE, F64
+from yuri.fileformat.expr import many_ins, read_ins, ins_tob, ins_into
+
+
+def best(fn: Callable[[], object], number: int, rep: int = 5):
+    return min(repeat(fn, number=number, repeat=rep))/number
+
+
+def mixed_ins(n: int, seed: int = 0) -> list[TIns]:
+    '''roughly the mix of script expressions: variables, small ints, operators, some strings'''
+    rnd = random.Random(seed)
+    ops = [IOpB.ADD, IOpB.SUB, IOpB.MUL, IOpB.EQ, IOpB.LAND, IOpB.NEG, IOpB.IDXEND]
+    lst: list[TIns] = []
+    for _ in range(n):
+        match rnd.randrange(10):
+            case 0 | 1 | 2: lst.append((IOpV.VAR, Tyq.NUM, rnd.randrange(1000, 5000)))
+            case 3: lst.append((IOpV.ARR, Tyq.STR, rnd.randrange(1000, 5000)))
+            case 4 | 5: lst.append((IOpA.I8, rnd.randrange(-128, 128)))
+            case 6: lst.append((IOpA.I32, rnd.randrange(-2**31, 2**31)))
+            case 7: lst.append((IOpA.F64, rnd.random()))
+            case 8: lst.append('"' + 'テキスト'[:rnd.randrange(1, 5)] + '"')
+            case _: lst.append(rnd.choice(ops))
+    return lst
+
+
+def bench_expr(n: int = 10000):
+    b = b''.join(ins_tob(i, 'cp932') for i in mixed_ins(n))
+
+    def one_by_one():
+        r = Rdr(b)
+        while r.idx < len(b):
+            read_ins(r)
+    for name, fn in (('many_ins', lambda: many_ins(Rdr(b))), ('read_ins', one_by_one)):
+        t = best(fn, 10)
+        print(f'expr {name:>9}: {t*1e3:8.2f} ms / {n} ins, {t/n*1e9:6.0f} ns/ins')
+
+
+def bench_enc(n: int = 10000):
+    lst = mixed_ins(int(n))
+
+    def old():  # Arg.into_expr with the compiler's post_ins callback before ins_into
+        buf: bytearray = bytearray()
+        refs: list[int] = []
+        for i in lst:
+            pre_len = len(buf)
+            buf += ins_tob(i, 'cp932')
+            match i:
+                case (_, _, _): refs.append(pre_len+4)
+        return buf
+
+    def new():
+        refs: list[tuple[int, int]] = []
+        return ins_into(lst, bytearray(), 'cp932', refs)
+    assert old() == new()
+    told, tnew = best(old, 10), best(new, 10)
+    print(f'enc {len(lst)} ins: old {told*1e3:8.2f} ms, new {tnew*1e3:8.2f} ms, {told/tnew:.2f}x, '
+          f'{tnew/len(lst)*1e9:.0f} ns/ins')
+
+
+class OldRdr(Rdr):
+    '''the readers before unpack_from: slice, check, int.from_bytes / Struct.unpack'''
+    __slots__ = ()
+    def si(self, n: int): return int.from_bytes(self.read(n), LE, signed=True)
+    def ui(self, n: int): return int.from_bytes(self.read(n), LE, signed=False)
+    def unpack(self, t: Struct): return t.unpack(self.read(t.size))
+    def f64(self) -> float: return F64.unpack(self.read(8))[0]
+    def u16(self): return self.ui(2)
+    def u32(self): return self.ui(4)
+    def i64(self): return self.si(8)
+    def u32s(self, n: int): return tuple(self.ui(4) for _ in range(n))
+
+
+def synth_ysv_ysl(n: int, v: int = 481, seed: int = 0):
+    rnd = random.Random(seed)
+    vs: list[Var] = []
+    for i in range(n):
+        match rnd.randrange(3):
+            case 0: ini: Any = (Typ.Int, rnd.randrange(-2**40, 2**40))
+            case 1: ini = (Typ.Flt, rnd.random())
+            case _: ini = (Typ.Str, ['"abc"'])
+        dims = [rnd.randrange(1, 10) for _ in range(rnd.randrange(3))]
+        vs.append(Var(VScope.G, VScoEx.DEF, 0, 1000+i, dims, ini))
+    fv, fl = BytesIO(), BytesIO()
+    YSVR(v, vs).write(fv)
+    YSLB.create(fl, v, [Lbl(f'label_{i}', i, i % 50, 0, 0) for i in range(n)])
+    return fv.getvalue(), fl.getvalue()
+
+
+def bench_rdr(ysbin: str | None = None, v: int | None = None):
+    '''real ysv.ybn / ysl.ybn from an extracted ysbin folder, or generated ones'''
+    if ysbin is None:
+        ysv, ysl = synth_ysv_ysl(20000, v := 481)
+    else:
+        with open(path.join(ysbin, 'ysv.ybn'), 'rb') as f:
+            ysv = f.read()
+        with open(path.join(ysbin, 'ysl.ybn'), 'rb') as f:
+            ysl = f.read()
+    prim = bytes(range(256))*400
+    srec = Struct('<BBHHBB')
+    n = len(prim)//8
+    for name, fn in (('ui(4)', lambda r: [r.ui(4) for _ in range(n)]),
+                     ('unpack', lambda r: [r.unpack(srec) for _ in range(n)]),
+                     ('u32s', lambda r: r.u32s(n))):
+        told, tnew = (best(lambda: fn(cls(prim)), 5) for cls in (OldRdr, Rdr))
+        print(f'rdr {name:>7} x{n}: old {told*1e3:8.2f} ms, new {tnew*1e3:8.2f} ms, {told/tnew:.2f}x')
+    ver = None if v is None else int(v)
+    for name, fn in (('ysv.ybn', lambda cls: YSVR.read(cls(ysv), v=ver)),
+                     ('ysl.ybn', lambda cls: YSLB.read(cls(ysl), v=ver))):
+        assert fn(OldRdr) == fn(Rdr)
+        told, tnew = (best(lambda: fn(cls), 5) for cls in (OldRdr, Rdr))
+        print(f'rdr {name}: old {told*1e3:8.2f} ms, new {tnew*1e3:8.2f} ms, {told/tnew:.2f}x')
+
+
+def bench_dec(ysbin: str | None = None, v: int | None = None, key: str | None = None, rep: int = 5):
+    '''do_ystb of both decompilers over all scripts of an extracted ysbin folder, args already decoded'''
+    if ysbin is None:
+        print('dec: usage: bench.py dec ysbin_folder [ver [key]]')
+        return
+    ver = None if v is None else int(v)
+    def rdr(name: str):
+        with open(path.join(ysbin, name), 'rb') as f:
+            return Rdr(f.read())
+    yscm = YSCM.read(rdr('ysc.ybn'), v=ver)
+    ysvr = YSVR.read(rdr('ysv.ybn'), v=ver)
+    yslb = YSLB.read(rdr('ysl.ybn'), v=ver)
+    ystbs: list[tuple[int, YSTB]] = []
+    for scr in YSTL.read(rdr('yst_list.ybn'), v=ver).scrs:
+        if scr.nvar < 0:
+            continue
+        with open(path.join(ysbin, f'yst{scr.iscr:0>5}.ybn'), 'rb') as f:
+            ystb = YSTB.read(f, yscm.cmdcodes, v=ver, key=None if key is None else int(key, 0))
+        for c in ystb.cmds:
+            for a in c.args:
+                a.dat
+        ystbs.append((scr.iscr, ystb))
+    ncmd = sum(len(t.cmds) for _, t in ystbs)
+    for dcls in (YDecYuri, YDecYuris):
+        for memo in (False, True):
+            ts: list[float] = []
+            dec = dcls(yscm, ysvr, yslb)
+            dec.memo.size = dec.memo.size if memo else 0
+            for _ in range(int(rep)):
+                dec.memo.d.clear()  # each pass starts cold, as one run does
+                t = perf_counter()
+                for iscr, ystb in ystbs:
+                    dec.do_ystb(iscr, ystb)
+                ts.append(perf_counter() - t)
+            t = min(ts)
+            print(f'dec {dcls.__name__:>9} memo={memo:d}: {t*1e3:8.1f} ms / {len(ystbs)} scripts, '
+                  f'{t/ncmd*1e6:.2f} us/cmd' + (f', memo {dec.memo}' if memo else ''))
+
+
+BENCHES: dict[str, Callable[..., None]] = {
+    'expr': bench_expr,
+    'enc': bench_enc,
+    'rdr': bench_rdr,
+    'dec': bench_dec,
+}
+
+
+if __name__ == '__main__':
+    if len(argv) > 1:
+        BENCHES[argv[1]](*argv[2:])
+    else:
+        for fn in BENCHES.values():
+            fn()
@@ -13,23 +13,34 @@ YPF_IN  = path.join('ypf', 'ysbin-input.ypf') # Input path for the original YPF
 YPF_EX  = path.join('ybn', 'original')     # Output extracted files from input YPF
 
 ## Get the actual version of the input YPF file
+## The archive is memory-mapped, entries are only read (and decompressed) when extracted
 with open(YPF_IN, 'rb') as ypfinobject:
-    ypf_in_entries, ypf_in_version = ypf_read(ypfinobject)
-    print('The actual version of the YPF file is:', ypf_in_version)
+    ypf_in = YPFArc.from_bio(ypfinobject)
+ypf_in_version = ypf_in.ver
+print('The actual version of the YPF file is:', ypf_in_version)
 
 ## Extract the files from the input YPF file to the given YPF_EX folder
-for file_path, file_type, compressed, file_data, uncompressed_length in ypf_in_entries:
-    print('Extracted file: ' + file_path)
-    file_path_full = path.join(YPF_EX, *file_path.split('\\'))
+## Set YPF_EX_ONLY to a prefix (for example 'ysbin\\') to only extract the scripts
+YPF_EX_ONLY = ''
+for entry in ypf_in:
+    if not entry.name.startswith(YPF_EX_ONLY):
+        continue
+    print('Extracted file: ' + entry.name)
+    file_path_full = path.join(YPF_EX, *entry.name.split('\\'))
     makedirs(path.dirname(file_path_full), exist_ok=True)
     # Save the file to the output path
     with open(file_path_full, 'wb') as extracted_ypf_object:
-        extracted_ypf_object.write(file_data)
+        extracted_ypf_object.write(ypf_in.data(entry))
+
+## Guess the actual version of the YBN files and the YSTB key from the headers and line numbers
+## of the scripts (one pass, instead of trial and error), use them below for YBN_VER_ACTUAL and YSTB_KEY
+probe_arc(ypf_in).print()
+ypf_in.close()
 
 
 ## Parameters for YBN compilation/decompilation, and YPF creation
 YPF_VER = ypf_in_version  # Version of the YPF file reported in its header.
-YBN_VER_ACTUAL = 480 # Version of the YBN files, which those can be different from the version the game's main executable may say. That can be obtained through trial and error by doing decompilations, and seeing which version does it successfully.
+YBN_VER_ACTUAL = 480 # Version of the YBN files, which those can be different from the version the game's main executable may say. The probe above prints a guess, otherwise it can be obtained through trial and error by doing decompilations, and seeing which version does it successfully.
 YCD = path.join('YSCom', str(YPF_VER) + '.ycd') # Official YSCom.ycd compiler
 YBN_IN = path.join(YPF_EX, 'ysbin') # Input path of the original YBN files obtained from the YPF file
 YSTB_KEY = 0x9C28430c # XOR key of the YSTB files (the ones that are called yst00000.ybn up to the last number). For more information on what key to use check the notes in the repository.
@@ -4,6 +4,7 @@ from sys import argv
 from os import path, walk, makedirs
 from typing import Sequence as Seq, NamedTuple
 from multiprocessing import Pool, freeze_support
+from yuri.util.sched import pool_map
 def raise_error(e: Exception): raise e
 
 
@@ -90,7 +91,7 @@ def ext_text(yroot: str,  # .yuri
     tasks = scan_and_mkdir(yroot, troot, yexts, yenc, tenc, False)
     if parallel:
         with Pool() as pool:
-            pool.map(task_extract, tasks)
+            pool_map(pool, task_extract, tasks, [path.getsize(t.yfn) for t in tasks])
     else:
         for tsk in tasks:
             task_extract(tsk)
@@ -105,7 +106,7 @@ def pat_text(yroot: str,  # .yuri
     tasks = scan_and_mkdir(yroot, troot, yexts, yenc, tenc, True)
     if parallel:
         with Pool() as pool:
-            pool.map(task_patch, tasks)
+            pool_map(pool, task_patch, tasks, [path.getsize(t.yfn) for t in tasks])
     else:
         for tsk in tasks:
             task_patch(tsk)
@@ -0,0 +1,18 @@
+# 只比较 YPF 的文件表（名称、大小、data_hash），不读取也不解压数据
+# usage: python ypf_diff.py old.ypf new.ypf [scripts.txt]
+from sys import argv, stdout
+from yuri.fileformat import YPFArc, ypf_diff
+
+
+def diff_files(old: str, new: str, scripts_out: str | None = None):
+    with open(old, 'rb') as fa, open(new, 'rb') as fb, YPFArc.from_bio(fa) as a, YPFArc.from_bio(fb) as b:
+        d = ypf_diff(a, b)
+    d.report(stdout)
+    if scripts_out is not None:
+        with open(scripts_out, 'w', encoding='utf-8') as f:
+            f.writelines(f'{n}\n' for n in d.scripts())
+    return d
+
+
+if __name__ == '__main__':
+    diff_files(*argv[1:4])
@@ -0,0 +1,91 @@
+# 查询 yuridec.run(also_dump=True) 写出的 .ystbc 文件，按 YSTB.print 的格式输出匹配的命令
+# usage: python ystb_query.py [-c CMD] [-v IVAR] [-t TEXT] [-l LNO] [--ysc YSC] dump_or_folder ...
+from os import path, walk
+from sys import stdout
+from typing import TextIO, Iterable, Sequence as Seq
+from fnmatch import fnmatchcase
+from argparse import ArgumentParser
+from yuri.fileformat import YSTBC, YSCM, Rdr, CP932
+DumpExt = '.ystbc'
+YscName = 'ysc.ybn'  # copied next to the dumps by yuridec.run
+
+
+def dump_files(paths: Iterable[str]):
+    for p in paths:
+        if not path.isdir(p):
+            yield p
+            continue
+        for dirpath, _, filenames in sorted(walk(p)):
+            yield from (path.join(dirpath, fn) for fn in sorted(filenames) if fn.endswith(DumpExt))
+
+
+def find_ysc(fn: str) -> str:
+    '''the nearest ysc.ybn in the folders above a dump file'''
+    d = path.dirname(path.abspath(fn))
+    while not path.isfile(p := path.join(d, YscName)):
+        assert (up := path.dirname(d)) != d, f'no {YscName} above {fn}, give --ysc'
+        d = up
+    return p
+
+
+def read_ysc(fn: str):
+    with open(fn, 'rb') as fp:
+        return YSCM.read(Rdr(fp.read(), CP932))
+
+
+def refers(dat: object, ivar: int) -> bool:
+    '''dat: an expression, refers to variable #ivar'''
+    return isinstance(dat, list) and any(isinstance(i, tuple) and len(i) == 3 and i[2] == ivar for i in dat)
+
+
+def has_text(dat: object, text: str) -> bool:
+    '''dat: WORD text or an expression with a string literal containing text'''
+    if isinstance(dat, str):
+        return text in dat
+    return isinstance(dat, list) and any(isinstance(i, str) and text in i for i in dat)
+
+
+def query(paths: Seq[str], cmd: str | None = None, ivar: int | None = None, text: str | None = None,
+          lno: int | None = None, ysc: str | None = None, f: TextIO = stdout) -> int:
+    '''cmd: a case-insensitive glob on the command name; all given filters must match;
+    ysc: for the command names, default: found by find_ysc -> number of matches'''
+    n = 0
+    yscms: dict[str, YSCM] = {}
+    for fn in dump_files(paths):
+        if (yscm := yscms.get(yfn := ysc or find_ysc(fn))) is None:
+            yscm = yscms[yfn] = read_ysc(yfn)
+        cmds = yscm.cmds
+        with open(fn, 'rb') as fp:
+            t = YSTBC.load(fp, yscm.cmdcodes)
+        names = [c.name.upper() for c in cmds]
+        head = False
+        for i, c in enumerate(t.cmds):
+            if lno is not None and c.lno != lno:
+                continue
+            if cmd is not None and not fnmatchcase(names[c.code], cmd.upper()):
+                continue
+            if ivar is not None or text is not None:
+                dats = [a.dat for a in c.args]
+                if ivar is not None and not any(refers(d, ivar) for d in dats):
+                    continue
+                if text is not None and not any(has_text(d, text) for d in dats):
+                    continue
+            if not head:
+                f.write(f'== {fn} ver={t.ver} key={t.key:0>8x}\n')
+                head = True
+            t.print_cmd(cmds, i, c, f)
+            n += 1
+    return n
+
+
+if __name__ == '__main__':
+    ap = ArgumentParser(description='query .ystbc dumps')
+    ap.add_argument('paths', nargs='+', help='dump files or folders searched for them')
+    ap.add_argument('-c', '--cmd', help='command name, glob: GOSUB, G_*')
+    ap.add_argument('-v', '--var', type=int, help='an argument refers to variable #VAR')
+    ap.add_argument('-t', '--text', help='WORD text or a string literal contains TEXT')
+    ap.add_argument('-l', '--lno', type=int, help='source line number')
+    ap.add_argument('--ysc', help=f'ysc.ybn for the command names, default: {YscName} above the dumps')
+    a = ap.parse_args()
+    n = query(a.paths, a.cmd, a.var, a.text, a.lno, a.ysc)
+    stdout.write(f'{n} commands\n')
@@ -1,8 +1,7 @@
 from __future__ import annotations
-from typing import Any
 from ..fileformat.expr import *
 CmdSkip = Callable[[int], bool]
-PostIns = Callable[[bytearray, int, TIns], Any]  # expr_dat, pre_len, ins
+VarRefs = list[tuple[int, int]]  # (offset of the u16 index in the expr section, index)
 def SkipLabel(v: int): return True
 def SkipNever(v: int): return False
 def SkipGVDef(v: int): return v >= 300 or v == 290
@@ -52,7 +51,7 @@ class Arg:
         else:
             return TArgFull.pack(self.aid, self.typ, self.aop, self.expr_siz, self.expr_off)
 
-    def into_expr(self, expr_dat: bytearray, enc: str, post_ins: PostIns | None):
+    def into_expr(self, expr_dat: bytearray, enc: str, refs: VarRefs | None):
         self.expr_off = beg = len(expr_dat)
         if isinstance(dat := self.dat, int | Cmd | None):
             pass
@@ -60,13 +59,8 @@ class Arg:
             expr_dat += dat.encode(enc)
         elif isinstance(dat, Buffer):
             expr_dat += dat
-        elif post_ins is None:
-            expr_dat += b''.join(Ins.to_b(i, enc) for i in dat)
         else:
-            for i in dat:
-                pre_len = len(expr_dat)
-                expr_dat += Ins.to_b(i, enc)
-                post_ins(expr_dat, pre_len, i)
+            ins_into(dat, expr_dat, enc, refs)
         self.expr_siz = len(expr_dat) - beg
 
 
@@ -83,8 +77,9 @@ TAsmV200 = tuple[bytes, bytearray, bytearray]
 TAsmV300 = tuple[bytes, bytearray, bytearray, bytearray, bytearray]
 
 
-def assemble_ystb(cmds: Seq[Cmd], v: int, enc: str, post_ins: PostIns | None,
+def assemble_ystb(cmds: Seq[Cmd], v: int, enc: str, refs: VarRefs | None,
                   w_ver: int | None) -> TAsmV200 | TAsmV300:
+    '''refs: gets the variable references of all expressions'''
     cmds_idx = 0
     cmds_off = [0]
     expr_dat = bytearray()
@@ -100,7 +95,7 @@ def assemble_ystb(cmds: Seq[Cmd], v: int, enc: str, post_ins: PostIns | None,
         cmds_off[0] += cmd_size
         for a in c.args:
             args_off[0] += a.size(v)
-            a.into_expr(expr_dat, enc, post_ins)
+            a.into_expr(expr_dat, enc, refs)
     cmds_dat = bytearray()
     args_dat = bytearray() if v >= 300 else cmds_dat
     lnos_dat = bytearray() if v >= 300 else cmds_dat  # not used in v200
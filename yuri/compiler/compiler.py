@@ -332,17 +332,12 @@ def compile_file(
         for stmt in lst:
             do_stmt(stmt)
 
-    def post_ins(expr_dat: bytearray, pre_len: int, ins: TIns):
-        match ins:
-            case (_, _, idx): pass
-            case _: return
-        # assert int.from_bytes(expr_dat[pre_len+4:pre_len+6], LE) == idx
-        if (isym := idx - VMinUsr) < 0:
-            return
-        syms[isym][0].append(pre_len+4)  # IOpV, 0x03, 0x01, Tyq, ISym:u16LE
-
     do_stmt_list(module.body)
-    ybnseg = assemble_ystb(cmds, ver, enc, post_ins, w_ver)
+    refs: VarRefs = []
+    ybnseg = assemble_ystb(cmds, ver, enc, refs, w_ver)
+    for off, idx in refs:  # IOpV, 0x03, 0x01, Tyq, ISym:u16LE
+        if (isym := idx - VMinUsr) >= 0:
+            syms[isym][0].append(off)
     lblpos = [(v.cmds_idx if ver >= 300 else v.cmds_off, k, i, l) for k, (v, i, l) in lbls.items()]
     return ntxt, nsvar, nlvar, lblpos, syms, ybnseg
 
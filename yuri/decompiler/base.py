@@ -1,9 +1,10 @@
 import re
-import ast
+import sys
 from ..fileformat import *
 from collections.abc import Buffer
 from abc import ABC, abstractmethod
-from collections import defaultdict as defdic
+from dataclasses import dataclass, field
+from collections import defaultdict as defdic, OrderedDict
 from typing import cast, Any, Sequence as Seq
 StrNoInit = []
 IntNoInit = [(IOpA.I64, 0)]
@@ -23,44 +24,73 @@ DefVarCmd.update({
     f'{sco.name}_{typ.name.upper()}': (sco, VScoEx.DEF, typ)
     for sco in (VScope.G, VScope.S, VScope.F)
     for typ in (Typ.Int, Typ.Flt, Typ.Str)})
-AstOpUSub = ast.USub()
-IOpBBinAst: dict[IOpB, ast.operator] = {
-    IOpB.MUL: ast.Mult(),
-    IOpB.DIV: ast.Div(),
-    IOpB.MOD: ast.Mod(),
-    IOpB.ADD: ast.Add(),
-    IOpB.SUB: ast.Sub(),
-    IOpB.BAND: ast.BitAnd(),
-    IOpB.BOR: ast.BitOr(),
-    IOpB.BXOR: ast.BitXor()}
-IOpBCmpAst: dict[IOpB, ast.cmpop] = {
-    IOpB.LT: ast.Lt(),
-    IOpB.LE: ast.LtE(),
-    IOpB.GT: ast.Gt(),
-    IOpB.GE: ast.GtE(),
-    IOpB.EQ: ast.Eq(),
-    IOpB.NE: ast.NotEq(),
-}
-IOpBLogAst: dict[IOpB, ast.boolop] = {
-    IOpB.LOR: ast.Or(),
-    IOpB.LAND: ast.And(),
+# ast.unparse operator precedences (ast._Precedence): an operand is parenthesized
+# when the precedence its position asks for is higher than its own
+PTest, POr, PAnd, PCmp, PBOr, PBXor, PBAnd, PArith, PTerm, PFactor, PAtom = 4, 5, 6, 8, 9, 10, 11, 13, 14, 15, 18
+# IOpB -> (operator, precedence, left operand, right operand, Yu-Ris precedence)
+OpSrc: dict[IOpB, tuple[str, int, int, int, int]] = {
+    IOpB.MUL: ('*', PTerm, PTerm, PTerm+1, 3),
+    IOpB.DIV: ('/', PTerm, PTerm, PTerm+1, 3),
+    IOpB.MOD: ('%', PTerm, PTerm, PTerm+1, 3),
+    IOpB.ADD: ('+', PArith, PArith, PArith+1, 4),
+    IOpB.SUB: ('-', PArith, PArith, PArith+1, 4),
+    IOpB.BAND: ('&', PBAnd, PBAnd, PBAnd+1, 8),
+    IOpB.BXOR: ('^', PBXor, PBXor, PBXor+1, 9),
+    IOpB.BOR: ('|', PBOr, PBOr, PBOr+1, 10),
+    IOpB.LT: ('<', PCmp, PCmp+1, PCmp+1, 6),
+    IOpB.LE: ('<=', PCmp, PCmp+1, PCmp+1, 6),
+    IOpB.GT: ('>', PCmp, PCmp+1, PCmp+1, 6),
+    IOpB.GE: ('>=', PCmp, PCmp+1, PCmp+1, 6),
+    IOpB.EQ: ('==', PCmp, PCmp+1, PCmp+1, 7),
+    IOpB.NE: ('!=', PCmp, PCmp+1, PCmp+1, 7),
+    IOpB.LAND: ('and', PAnd, PAnd+1, PAnd+2, 11),
+    IOpB.LOR: ('or', POr, POr+1, POr+2, 12),
 }
+YuPNeg = 2
+InfSrc = '1e' + repr(sys.float_info.max_10_exp + 1)
+TSrc = tuple[str, int, int]  # text, precedence, Yu-Ris precedence
+TUsed = list[tuple[int, str]]  # (index, name) of the locals an expression refers to
+
+
+def const_src(v: int | float) -> str:
+    '''as ast.unparse writes a number'''
+    if isinstance(v, float):
+        return repr(v).replace('inf', InfSrc).replace('nan', f'({InfSrc}-{InfSrc})')
+    return repr(v)
+
+
+@dataclass(slots=True)
+class ExprMemo:
+    '''LRU of rendered expressions: (encoding, raw bytes, lit_str) -> (text, locals used)'''
+    size: int
+    hits: int = 0
+    misses: int = 0  # also the ones whose locals had other names
+    evicted: int = 0
+    d: OrderedDict[tuple[str, bytes, bool], tuple[str, TUsed]] = field(default_factory=OrderedDict)
+
+    def __str__(self):
+        n = self.hits + self.misses
+        return f'{self.hits}/{n} hits ({self.hits/(n or 1):.1%}), {len(self.d)} kept, {self.evicted} evicted'
 
 
 class YDecBase(ABC):
     ExtraExt: str
     EmptyFile: str
     DefaultEnc: str
-    AstEmpty: ast.expr
-    AstNameTOI: ast.expr
-    AstNameTOS: ast.expr
+    SrcEmpty: str  # a missing operand
+    SrcTOI: str
+    SrcTOS: str
+    OpSrc: dict[IOpB, tuple[str, int, int, int, int]] = OpSrc
+    YuPrec: bool  # also parenthesize by Yu-Ris precedence
+    MemoSize = 1 << 14  # expressions kept rendered, 0: off
+    memo: ExprMemo
     ver: int
     new_adr: bool
     codes: CmdCodes
     cnames: list[tuple[str, list[str]]]
     defcmds: dict[int, tuple[VScope, VScoEx, Typ]]
     vars: list[tuple[str, Var] | None]  # [ivar]: (name, Var)
-    lbls: list[dict[int, list[str]]]  # [iscr]: cmds_off -> lbl_name[]
+    lbls: list[dict[int, list[str]]]  # [iscr]: cmds_off -> lbl_name[], not changed after __init__
     out_gfile: str | None
 
     @staticmethod
@@ -102,10 +132,15 @@ class YDecBase(ABC):
                 if RGoodName.match(v.name):
                     vars[i] = (v.name, var)
         self.out_gfile = self._init_gfile()if ver >= 300 or ver == 290 else None
+        self.memo = ExprMemo(self.MemoSize)
 
     @abstractmethod
     def _init_gfile(self) -> str: pass
 
+    def script_lbls(self, iscr: int) -> dict[int, list[str]]:
+        '''a copy for one do_ystb call to consume, so that a decompiler can be reused, also from threads'''
+        return dict(self.lbls[iscr]) if iscr < len(self.lbls) else {}
+
     def def_local(self, idx: int, v: Var, lvars: dict[int, tuple[str, Var]]):
         assert idx >= len(self.vars) or self.vars[idx] is None, f'redefine nonlocal #{idx}'
         assert idx not in lvars, f'redefine local #{idx}'
@@ -133,54 +168,87 @@ class YDecBase(ABC):
     @abstractmethod
     def do_ystb(self, iscr: int, ystb: YSTB, *args: Any, **kwargs: Any) -> str: pass
     @abstractmethod
-    def var_to_ast(self, tyq: Tyq, idx: int, lvars: dict[int, tuple[str, Var]]) -> ast.expr: pass
+    def var_to_src(self, tyq: Tyq, idx: int, lvars: dict[int, tuple[str, Var]]) -> str: pass
+
+    def arg_src(self, arg: RArg, lvars: dict[int, tuple[str, Var]], lit_str: bool = False) -> str:
+        '''ins_to_src of an expression argument, through the memo while its raw bytes are at hand;
+        a hit must see the same names for the locals it uses'''
+        memo = self.memo
+        if memo.size <= 0 or (raw := arg.raw) is None:
+            assert isinstance(dat := arg.dat, list)
+            return self.ins_to_src(dat, lvars, lit_str)
+        key = (*raw, lit_str)
+        if (ent := memo.d.get(key)) is not None:
+            text, used = ent
+            if all((lv := lvars.get(i)) is not None and lv[0] == name for i, name in used):
+                memo.hits += 1
+                try:
+                    memo.d.move_to_end(key)
+                except KeyError:  # evicted meanwhile by another thread
+                    pass
+                return text
+        memo.misses += 1
+        assert isinstance(dat := arg.dat, list)
+        used: TUsed = []
+        memo.d[key] = (text := self.ins_to_src(dat, lvars, lit_str, used), used)
+        if len(memo.d) > memo.size:
+            try:
+                memo.d.popitem(last=False)
+                memo.evicted += 1
+            except KeyError:
+                pass
+        return text
 
-    def ins_to_ast(self, lst: Seq[TIns], lvars: dict[int, tuple[str, Var]], lit_str: bool = False) -> ast.expr:
-        stk: list[ast.expr | None] = []
+    def ins_to_src(self, lst: Seq[TIns], lvars: dict[int, tuple[str, Var]], lit_str: bool = False,
+                   used: TUsed | None = None) -> str:
+        '''the text ast.unparse gives for the Python tree of the expression,
+        with YuPrec also the parens Yu-Ris precedence needs on top of Python's;
+        used: gets the locals referred to'''
+        yu, ops, gvars = self.YuPrec, self.OpSrc, self.vars
+        empty: TSrc = (self.SrcEmpty, PAtom, -1)
+        stk: list[TSrc | None] = []
         for ins in lst:
             assert not isinstance(ins, Buffer)
             match ins:
                 case str(s):
-                    if lit_str:
-                        stk.append(ast.Name(s))
-                    else:
-                        stk.append(ast.Constant(Ins.ins_to_pstr(s)))
-                case (IOpA(), v): stk.append(ast.Constant(v))
+                    stk.append((s if lit_str else repr(Ins.ins_to_pstr(s)), PAtom, -1))
+                case (IOpA(), v): stk.append((const_src(v), PAtom, -1))
                 case (IOpV(opv), tyq, idx):
+                    if used is not None and not (idx < len(gvars) and gvars[idx]):
+                        used.append((idx, lvars[idx][0]))
                     match opv:
-                        case IOpV.VAR: stk.append(self.var_to_ast(tyq, idx, lvars))
-                        case IOpV.ARR: stk.append(ast.Call(self.var_to_ast(tyq, idx, lvars)))
+                        case IOpV.VAR: stk.append((self.var_to_src(tyq, idx, lvars), PAtom, -1))
+                        case IOpV.ARR: stk.append((self.var_to_src(tyq, idx, lvars)+'()', PAtom, -1))
                         case _:  # None, arr, dims
                             stk.append(None)
-                            stk.append(self.var_to_ast(tyq, idx, lvars))
+                            stk.append((self.var_to_src(tyq, idx, lvars), PAtom, -1))
                 case IOpB.IDXEND:
-                    dims: list[ast.expr] = []
+                    dims: list[TSrc] = []
                     while (d := stk.pop()) is not None:
                         dims.append(d)
                     assert len(dims) >= 2
-                    arr = dims.pop()
+                    arr, ap, _ = dims.pop()
                     dims.reverse()
-                    stk.append(ast.Call(arr, dims))
+                    arr = f'({arr})' if PAtom > ap else arr
+                    stk.append((f'{arr}({', '.join(d[0] for d in dims)})', PAtom, -1))
                 case IOpB.NOP: pass
                 case IOpB.TOI | IOpB.TOS:
                     assert (exp := stk.pop()) is not None
-                    astname = self.AstNameTOI if ins == IOpB.TOI else self.AstNameTOS
-                    stk.append(ast.Call(astname, [exp]))
+                    stk.append((f'{self.SrcTOI if ins == IOpB.TOI else self.SrcTOS}({exp[0]})', PAtom, -1))
                 case IOpB.NEG:
                     assert (exp := stk.pop()) is not None
-                    stk.append(ast.UnaryOp(AstOpUSub, exp))
-                case _ if ins in IOpBBinAst:
-                    assert (rhs := stk.pop() if len(stk) else self.AstEmpty) is not None
-                    assert (lhs := stk.pop() if len(stk) else self.AstEmpty) is not None
-                    stk.append(ast.BinOp(lhs, IOpBBinAst[ins], rhs))
-                case _ if ins in IOpBLogAst:
-                    assert (rhs := stk.pop() if len(stk) else self.AstEmpty) is not None
-                    assert (lhs := stk.pop() if len(stk) else self.AstEmpty) is not None
-                    stk.append(ast.BoolOp(IOpBLogAst[ins], [lhs, rhs]))
+                    es, ep, eyp = exp
+                    stk.append((f'-({es})' if (yu and YuPNeg <= eyp) or PFactor > ep else '-'+es, PFactor, YuPNeg))
                 case _:
-                    assert (rhs := stk.pop() if len(stk) else self.AstEmpty) is not None
-                    assert (lhs := stk.pop() if len(stk) else self.AstEmpty) is not None
-                    op = IOpBCmpAst[ins]
-                    stk.append(ast.Compare(lhs, [op], [rhs]))
-        assert len(stk) == 1 and stk[0] is not None
-        return stk[0]
+                    sym, p, pl, pr, yp = ops[ins]
+                    assert (rhs := stk.pop() if len(stk) else empty) is not None
+                    assert (lhs := stk.pop() if len(stk) else empty) is not None
+                    ls, lp, lyp = lhs
+                    rs, rp, ryp = rhs
+                    if (yu and yp < lyp) or pl > lp:
+                        ls = f'({ls})'
+                    if (yu and yp <= ryp) or pr > rp:
+                        rs = f'({rs})'
+                    stk.append((f'{ls} {sym} {rs}', p, yp))
+        assert len(stk) == 1 and (top := stk[0]) is not None
+        return top[0]
@@ -1,6 +1,8 @@
 from .base import *
+import ast
 from typing import Never
 from enum import IntEnum
+from dataclasses import dataclass, field
 
 
 class Ctl(IntEnum):
@@ -10,33 +12,62 @@ class Ctl(IntEnum):
     LOOP = 3
 
 
-def check_pass(lst: list[ast.stmt]):
+@dataclass(slots=True)
+class Blk:
+    '''if (elif: an if alone in orelse), while or with; statements are lines or blocks'''
+    kw: str
+    head: str
+    body: 'list[Stmt]' = field(default_factory=list)
+    orelse: 'list[Stmt]' = field(default_factory=list)
+
+
+Stmt = str | Blk
+
+
+def check_pass(lst: list[Stmt]):
     if len(lst) == 0:
-        lst.append(ast.Pass())
+        lst.append('pass')
+
+
+def emit(lst: list[Stmt], ind: str, out: list[str]):
+    '''lines as ast.unparse writes the equivalent Python statements'''
+    for s in lst:
+        if isinstance(s, str):
+            out.append(ind+s)
+            continue
+        out.append(f'{ind}{s.kw} {s.head}:')
+        emit(s.body, ind+'    ', out)
+        while len(s.orelse) == 1 and isinstance(e := s.orelse[0], Blk) and e.kw == 'if':
+            s = e
+            out.append(f'{ind}elif {s.head}:')
+            emit(s.body, ind+'    ', out)
+        if s.orelse:
+            out.append(f'{ind}else:')
+            emit(s.orelse, ind+'    ', out)
+
+
+def docstring_src(s: str) -> str:
+    '''ast.unparse writes a leading string statement as a docstring'''
+    return ast.unparse(ast.Module([ast.Expr(ast.Constant(s))]))
 
 
 TyqPrefToSuf = {'$': 'S', '@': 'N', '&@': 'AN', '&$': 'AS', '$@': 'SN'}
-AstListLbl: list[ast.expr] = [ast.Name('LBL')]
-AstListUnderline = ast.Name('_')
 CtlIfElif = (Ctl.IF, Ctl.ELIF)
-Aug: list[ast.operator] = [
-    ast.Add(),
-    ast.Add(), ast.Sub(), ast.Mult(), ast.Div(),
-    ast.Mod(), ast.BitAnd(), ast.BitOr(), ast.BitXor()
-]
+Aug = ['+', '+', '-', '*', '/', '%', '&', '|', '^']
 
 
 class YDecYuri(YDecBase):
     ExtraExt = '.yuri'
     EmptyFile = 'pass'
     DefaultEnc = 'utf-8'
-    AstNameTOI = ast.Name('int')
-    AstNameTOS = ast.Name('str')
-    AstEmpty = ast.Constant(None)
+    SrcTOI = 'int'
+    SrcTOS = 'str'
+    SrcEmpty = 'None'
+    YuPrec = False
 
-    def var_to_ast(self, tyq: Tyq, idx: int, lvars: dict[int, tuple[str, Var]]) -> ast.expr:
+    def var_to_src(self, tyq: Tyq, idx: int, lvars: dict[int, tuple[str, Var]]) -> str:
         tyqpref, name = self.ins_get_var(tyq, idx, lvars)
-        return ast.Attribute(ast.Name(name), TyqPrefToSuf[tyqpref])
+        return f'{name}.{TyqPrefToSuf[tyqpref]}'
 
     def _init_gfile(self) -> str:
         empty_lvars: dict[int, tuple[str, Var]] = {}
@@ -48,7 +79,7 @@ class YDecYuri(YDecBase):
                 case None: continue
                 case (Typ.Int, i): rhs = f'={i}' if i else ''
                 case (Typ.Flt, f): rhs = f'={f}' if f else ''
-                case (Typ.Str, l): rhs = '='+ast.unparse(self.ins_to_ast(l, empty_lvars)) if len(l) else ''
+                case (Typ.Str, l): rhs = '='+self.ins_to_src(l, empty_lvars) if len(l) else ''
             (name, var), typ = v, vi[0]
             suf = '.S' if typ == Typ.Str else '.N'
             cmd = f'G_{typ.name.upper()}{SExCh[v[1].scoex]}'
@@ -59,14 +90,14 @@ class YDecYuri(YDecBase):
     def do_ystb(self, iscr: int, ystb: YSTB, *_args: Never, **_kwas: Never) -> str:
         assert ystb.ver == self.ver, f'ystb.ver={ystb.ver} self.ver={self.ver}'
         cnames, codes, defcmds = self.cnames, self.codes, self.defcmds
-        lbls = self.lbls[iscr] if iscr < len(self.lbls) else {}
-        stk: list[list[ast.stmt]] = [root := []]
+        lbls = self.script_lbls(iscr)
+        stk: list[list[Stmt]] = [root := []]
         lvars: dict[int, tuple[str, Var]] = {}
         ctl: list[Ctl] = []
         for c in ystb.cmds:
             if (off_lbls := lbls.get(c.off)):
                 del lbls[c.off]  # LBL = 'LabelName'
-                stk[-1].extend(ast.Assign(AstListLbl, ast.Constant(l), lineno=0) for l in off_lbls)
+                stk[-1].extend(f'LBL = {l!r}' for l in off_lbls)
             narg = len(args := c.args)
             match c.code:
                 case codes.IF:
@@ -74,15 +105,13 @@ class YDecYuri(YDecBase):
                     # if else -> [-2][-1]if [-1]if/elif.else
                     # if elif -> [-3][-1]if [-2]if/elif.else [-1]elif.body
                     assert narg == 3
-                    assert isinstance(dat := args[0].dat, list)
-                    stk[-1].append(ifs := ast.If(self.ins_to_ast(dat, lvars)))
+                    stk[-1].append(ifs := Blk('if', self.arg_src(args[0], lvars)))
                     stk.append(ifs.body)
                     ctl.append(Ctl.IF)
                 case codes.ELSE if narg == 3:
                     assert (top := ctl[-1]) in CtlIfElif
-                    assert isinstance(dat := args[0].dat, list)
-                    assert isinstance(ifs := stk[-2][-1], ast.If)
-                    ifs.orelse.append(eifs := ast.If(self.ins_to_ast(dat, lvars)))
+                    assert isinstance(ifs := stk[-2][-1], Blk) and ifs.kw == 'if'
+                    ifs.orelse.append(eifs := Blk('if', self.arg_src(args[0], lvars)))
                     if top == Ctl.IF:
                         stk.append(eifs.body)
                         ctl.append(Ctl.ELIF)
@@ -95,7 +124,7 @@ class YDecYuri(YDecBase):
                 case codes.ELSE:
                     assert narg == 0
                     assert (top := ctl[-1]) in CtlIfElif
-                    assert isinstance(ifs := stk[-2][-1], ast.If)
+                    assert isinstance(ifs := stk[-2][-1], Blk) and ifs.kw == 'if'
                     if top == Ctl.ELIF:
                         check_pass(stk.pop())
                         ctl[-1] = Ctl.ELSE
@@ -114,24 +143,23 @@ class YDecYuri(YDecBase):
                 case codes.IFBLEND: assert narg == 0 and ctl[-1] in CtlIfElif
                 case codes.LOOP:
                     assert narg == 2
-                    assert isinstance(dat := args[0].dat, list)
-                    stk[-1].append(ws := ast.While(self.ins_to_ast(dat, lvars)))
+                    stk[-1].append(ws := Blk('while', self.arg_src(args[0], lvars)))
                     stk.append(ws.body)
                     ctl.append(Ctl.LOOP)
                 case codes.LOOPEND:
                     assert narg == 0
                     assert ctl.pop() == Ctl.LOOP
-                    assert isinstance(stk[-2][-1], ast.While)
+                    assert isinstance(ws := stk[-2][-1], Blk) and ws.kw == 'while'
                     check_pass(stk.pop())
                 case codes._:
-                    assert narg == 1 and isinstance(dat := args[0].dat, list)
-                    stk[-1].append(ast.Expr(ast.Subscript(AstListUnderline, self.ins_to_ast(dat, lvars))))
+                    assert narg == 1
+                    stk[-1].append(f'_[{self.arg_src(args[0], lvars)}]')
                 case codes.WORD:
                     assert narg == 1 and isinstance(dat := args[0].dat, str)
-                    stk[-1].append(ast.Expr(ast.Constant(dat)))
+                    stk[-1].append(docstring_src(dat) if stk[-1] is root and not root else repr(dat))
                 case codes.RETURNCODE:
                     assert narg == 1
-                    stk[-1].append(ast.Expr(ast.Yield(ast.Constant(args[0].siz))))
+                    stk[-1].append(f'yield {args[0].siz!r}')
                 case code if code in defcmds or code == codes.LET:
                     assert narg == 2
                     lhs, rhs = args
@@ -149,16 +177,18 @@ class YDecYuri(YDecBase):
                             case Typ.Flt: ini = (typ, 0.0)
                             case Typ.Str: ini = (typ, (''))
                         self.def_local(idx, Var(sco, sex, iscr, idx, (), ini), lvars)
-                    lhsast = self.ins_to_ast(lhsdat, lvars)
-                    rhsast = self.ins_to_ast(rhsdat, lvars)
+                    lhssrc = self.arg_src(lhs, lvars)
+                    rhssrc = self.arg_src(rhs, lvars)
                     if code == codes.LET:
-                        if not isinstance(lhsast, ast.Attribute):
-                            assert isinstance(lhsast, ast.Call)
-                            lhsast = ast.Subscript(ast.Name('LET'), lhsast)
+                        match next(i for i in reversed(lhsdat) if i != IOpB.NOP):  # what lhs evaluates to
+                            case (IOpV.VAR, _, _): pass  # x.N
+                            case (IOpV.ARR, _, _) | IOpB.IDXEND | IOpB.TOI | IOpB.TOS:  # a call
+                                lhssrc = f'LET[{lhssrc}]'
+                            case _: assert False, lhssrc
                         if lhs.aop == AOp.EQL:
-                            stk[-1].append(ast.Assign([lhsast], rhsast, lineno=0))
+                            stk[-1].append(f'{lhssrc} = {rhssrc}')
                         else:
-                            stk[-1].append(ast.AugAssign(lhsast, Aug[lhs.aop], rhsast))
+                            stk[-1].append(f'{lhssrc} {Aug[lhs.aop]}= {rhssrc}')
                     else:
                         assert lhs.aop == AOp.EQL
                         match lhsdat[0]:
@@ -168,28 +198,29 @@ class YDecYuri(YDecBase):
                         assert (vi := v[1].init) is not None
                         s_noinit = vi[1] == StrNoInit
                         n_noinit = rhsdat == IntNoInit
-                        lsub = ast.Subscript(ast.Name(cnames[code][0]), lhsast)
+                        lsub = f'{cnames[code][0]}[{lhssrc}]'
                         if s_noinit or n_noinit:
-                            stk[-1].append(ast.Expr(lsub))
+                            stk[-1].append(lsub)
                         else:
-                            stk[-1].append(ast.Assign([lsub], rhsast, lineno=0))
+                            stk[-1].append(f'{lsub} = {rhssrc}')
                 case code:
                     cmdname, argnames = cnames[code]
-                    c_call = ast.Call(ast.Name(cmdname))
-                    kwlist = c_call.keywords
-                    aolist: list[ast.stmt] = []
+                    kwlist: list[str] = []
+                    aolist: list[Stmt] = []
                     for arg in args:
-                        assert isinstance(dat := arg.dat, list)
                         assert len(a_name := argnames[arg.id]) > 0
                         a_name = 'LBL' if a_name == '#' else a_name
-                        a_expr = self.ins_to_ast(dat, lvars)
+                        a_expr = self.arg_src(arg, lvars)
                         if arg.aop == 0:
-                            kwlist.append(ast.keyword(a_name, a_expr))
+                            kwlist.append(f'{a_name}={a_expr}')
                         else:
-                            kwlist.append(ast.keyword(a_name, ast.Name('_')))
-                            aolist.append(ast.AugAssign(ast.Name(a_name), Aug[arg.aop], a_expr))
+                            kwlist.append(f'{a_name}=_')
+                            aolist.append(f'{a_name} {Aug[arg.aop]}= {a_expr}')
+                    c_call = f'{cmdname}({', '.join(kwlist)})'
                     if len(aolist):
-                        stk[-1].append(ast.With([ast.withitem(c_call)], aolist, lineno=0))
+                        stk[-1].append(Blk('with', c_call, aolist))
                     else:
-                        stk[-1].append(ast.Expr(c_call))
-        return ast.unparse(ast.Module(root))
+                        stk[-1].append(c_call)
+        out: list[str] = []
+        emit(root, '', out)
+        return '\n'.join(out)
@@ -6,19 +6,21 @@ class YDecYuris(YDecBase):
     ExtraExt = ''
     EmptyFile = ';'
     DefaultEnc = CP932
-    AstEmpty = ast.Name('')
-    AstNameTOI = ast.Name('@')
-    AstNameTOS = ast.Name('$')
+    SrcEmpty = ''
+    SrcTOI = '@'
+    SrcTOS = '$'
+    OpSrc = {**OpSrc, IOpB.LAND: ('&&', *OpSrc[IOpB.LAND][1:]), IOpB.LOR: ('||', *OpSrc[IOpB.LOR][1:])}
+    YuPrec = True
 
-    def var_to_ast(self, tyq: Tyq, idx: int, lvars: dict[int, tuple[str, Var]]) -> ast.expr:
+    def var_to_src(self, tyq: Tyq, idx: int, lvars: dict[int, tuple[str, Var]]) -> str:
         tyqpref, name = self.ins_get_var(tyq, idx, lvars)
-        return ast.Name(tyqpref+name)
+        return tyqpref+name
 
     def ins_to_expr(self, lst: Seq[TIns], lvars: dict[int, tuple[str, Var]]) -> str:
-        res = ast.unparse(yuris_prec(self.ins_to_ast(lst, lvars, True))[1])
-        res = res.replace(' and ', ' && ')
-        res = res.replace(' or ', ' || ')
-        return res
+        return self.ins_to_src(lst, lvars, True)
+
+    def arg_expr(self, arg: RArg, lvars: dict[int, tuple[str, Var]]) -> str:
+        return self.arg_src(arg, lvars, True)
 
     def _init_gfile(self) -> str:
         lines: list[str] = []
@@ -40,7 +42,7 @@ class YDecYuris(YDecBase):
     def do_ystb(self, iscr: int, ystb: YSTB, *_args: Never, **_kwas: Never) -> str:
         assert ystb.ver == self.ver, f'ystb.ver={ystb.ver} self.ver={self.ver}'
         lno, cnames, codes, defcmds = 1, self.cnames, self.codes, self.defcmds
-        lbls = self.lbls[iscr] if iscr < len(self.lbls) else {}
+        lbls = self.script_lbls(iscr)
         preps: list[str] = []
         lvars: dict[int, tuple[str, Var]] = {}
         lines: list[list[str]] = [[] for _ in range(max(c.lno for c in ystb.cmds))]
@@ -63,17 +65,17 @@ class YDecYuris(YDecBase):
                 case codes.ELSE if narg == 0:
                     line.append('ELSE[]')
                 case codes.IF | codes.ELSE as code:
-                    assert narg == 3 and isinstance(dat := args[0].dat, list)
+                    assert narg == 3
                     cmdname = 'IF' if code == codes.IF else 'ELSE'
-                    line.append(f'{cmdname}[{self.ins_to_expr(dat, lvars)}]')
+                    line.append(f'{cmdname}[{self.arg_expr(args[0], lvars)}]')
                 case codes.LOOP:
                     assert narg == 2 and isinstance(dat := args[0].dat, list)
                     match dat:
                         case [(IOpA.I8, -1)]: line.append('LOOP[]')
-                        case _: line.append(f'LOOP[SET={self.ins_to_expr(dat, lvars)}]')
+                        case _: line.append(f'LOOP[SET={self.arg_expr(args[0], lvars)}]')
                 case codes._:
-                    assert narg == 1 and isinstance(dat := args[0].dat, list)
-                    line.append(f'_[{self.ins_to_expr(dat, lvars)}]')
+                    assert narg == 1
+                    line.append(f'_[{self.arg_expr(args[0], lvars)}]')
                 case codes.WORD:
                     assert narg == 1 and isinstance(dat := args[0].dat, str)
                     line.append(dat)
@@ -103,8 +105,8 @@ class YDecYuris(YDecBase):
                             case Typ.Flt: ini = (typ, 0.0)
                             case Typ.Str: ini = (typ, (''))
                         self.def_local(idx, Var(sco, sex, iscr, idx, (), ini), lvars)
-                    lhsstr = self.ins_to_expr(lhsdat, lvars)
-                    rhsstr = self.ins_to_expr(rhsdat, lvars)
+                    lhsstr = self.arg_expr(lhs, lvars)
+                    rhsstr = self.arg_expr(rhs, lvars)
                     if code == codes.LET:
                         line.append(f'{lhsstr}{lhs.aop}{rhsstr}')
                     else:
@@ -126,59 +128,8 @@ class YDecYuris(YDecBase):
                     cmdname, argnames = cnames[code]
                     for arg in args:
                         assert len(argname := argnames[arg.id]) > 0
-                        assert isinstance(dat := arg.dat, list)
-                        argsegs.append(f'{argname}{arg.aop}{self.ins_to_expr(dat, lvars)}')
+                        argsegs.append(f'{argname}{arg.aop}{self.arg_expr(arg, lvars)}')
                     line.append(f'{cmdname}[{' '.join(argsegs)}]')
         assert len(lbls) == 0, 'lables not consumed: '+str(lbls)
         return '\n'.join(';'.join(line) for line in lines)
 
-
-AstEmpty = ast.Name('')
-def force_paren(e: ast.expr) -> ast.expr: return ast.Call(AstEmpty, [e])
-
-
-def yuris_prec(e: ast.expr) -> tuple[int, ast.expr]:
-    match e:
-        case ast.Name(): return (-1, e)
-        case ast.Constant(): return (-1, e)
-        case ast.Call(_, args):
-            e.args = [yuris_prec(a)[1] for a in args]
-            return (-1, e)
-        case ast.BinOp(l, op, r):
-            match op:
-                case ast.Mult() | ast.Div() | ast.Mod(): p = 3
-                case ast.Add() | ast.Sub(): p = 4
-                case ast.BitAnd(): p = 8
-                case ast.BitXor(): p = 9
-                case ast.BitOr(): p = 10
-                case _: assert False
-            lp, l = yuris_prec(l)
-            rp, r = yuris_prec(r)
-            l = force_paren(l) if p < lp else l
-            r = force_paren(r) if p <= rp else r
-            return (p, ast.BinOp(l, op, r))
-        case ast.BoolOp(op, [l, r]):
-            match op:
-                case ast.And(): p = 11
-                case ast.Or(): p = 12
-                case _: assert False
-            lp, l = yuris_prec(l)
-            rp, r = yuris_prec(r)
-            l = force_paren(l) if p < lp else l
-            r = force_paren(r) if p <= rp else r
-            return (p, ast.BoolOp(op, [l, r]))
-        case ast.Compare(l, [op], [r]):
-            match op:
-                case ast.Eq() | ast.NotEq(): p = 7
-                case _: p = 6
-            lp, l = yuris_prec(l)
-            rp, r = yuris_prec(r)
-            l = force_paren(l) if p < lp else l
-            r = force_paren(r) if p <= rp else r
-            return (p, ast.Compare(l, [op], [r]))
-        case ast.UnaryOp(ast.USub(), r):
-            p = 2
-            rp, r = yuris_prec(r)
-            e.operand = force_paren(r) if p <= rp else r
-            return (p, e)
-        case _: assert False, ast.unparse(e)
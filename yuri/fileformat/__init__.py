@@ -1,6 +1,6 @@
 from .common import Rdr, CP932, VScope, VScoEx, VMinUsr
 from .expr import Typ, Tyq, TIns, Ins, IOpA, IOpB, IOpV
-from .ypf import read as ypf_read, make as ypf_make, Ent as YPFEnt
+from .ypf import read as ypf_read, make as ypf_make, patch as ypf_patch, Writer as YPFWriter, CompStats as YPFCompStats, incompressible, diff as ypf_diff, Diff as YPFDiff, Ent as YPFEnt, Arc as YPFArc, Rec as YPFRec
 from .yscm import YSCM, MArg, MCmd
 from .yser import YSER, Err
 from .yslb import YSLB, Lbl
@@ -8,11 +8,12 @@ from .ystd import YSTD
 from .ystl import YSTL, Scr
 from .ysvr import YSVR, Var
 from .yscd import YSCD, DArg, DCmd, DVar
-from .ystb import YSTB, RArg, RCmd, AOp, CmdCodes, KEY_200, KEY_290
+from .ystb import YSTB, YSTBC, RArg, RCmd, AOp, CmdCodes, KEY_200, KEY_290
+from .probe import Probe, probe_arc, probe_dir
 __all__ = [
     'Rdr', 'CP932', 'VScope', 'VScoEx', 'VMinUsr',
     'Typ', 'Tyq', 'TIns', 'Ins', 'IOpA', 'IOpB', 'IOpV',
-    'ypf_read', 'ypf_make', 'YPFEnt',
+    'ypf_read', 'ypf_make', 'ypf_patch', 'YPFWriter', 'YPFCompStats', 'incompressible', 'ypf_diff', 'YPFDiff', 'YPFEnt', 'YPFArc', 'YPFRec',
     'YSCM', 'MArg', 'MCmd',
     'YSER', 'Err',
     'YSLB', 'Lbl',
@@ -20,5 +21,6 @@ __all__ = [
     'YSTL', 'Scr',
     'YSVR', 'Var',
     'YSCD', 'DArg', 'DCmd', 'DVar',
-    'YSTB', 'RArg', 'RCmd', 'AOp', 'CmdCodes', 'KEY_200', 'KEY_290'
+    'YSTB', 'YSTBC', 'RArg', 'RCmd', 'AOp', 'CmdCodes', 'KEY_200', 'KEY_290',
+    'Probe', 'probe_arc', 'probe_dir'
 ]
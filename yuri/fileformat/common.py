@@ -1,8 +1,8 @@
 from enum import IntEnum
-from struct import Struct as St
+from struct import Struct as St, unpack_from
 from typing import BinaryIO as BinIO, Protocol as Prot
 from sys import stdout  # pyright: ignore[reportUnusedImport]
-from typing import cast, TextIO  # pyright: ignore[reportUnusedImport]
+from typing import cast, TextIO, Any  # pyright: ignore[reportUnusedImport]
 from dataclasses import dataclass  # pyright: ignore[reportUnusedImport]
 from typing import Literal as Lit, Sequence as Seq, Callable  # pyright: ignore[reportUnusedImport]
 VerRange = range(200, 600)
@@ -11,6 +11,9 @@ VMinUsr = 1000
 LE = 'little'
 CP932 = 'cp932'
 F64 = St('<d')
+U8, U16, U32, I64 = St('<B'), St('<H'), St('<I'), St('<q')
+SUInts = {1: U8, 2: U16, 4: U32, 8: St('<Q')}
+SSInts = {1: St('<b'), 2: St('<h'), 4: St('<i'), 8: I64}
 Ints = tuple[int, ...]
 
 
@@ -53,15 +56,46 @@ class Rdr:
         self.idx = end
         return ret
 
+    def skip(self, n: int):
+        '''-> the index before, one bounds check, no slicing'''
+        beg = self.idx
+        assert (end := beg+n) <= len(self.v), f'read: want={n}, got={len(self.v)-beg}, at={beg}'
+        self.idx = end
+        return beg
+
+    def u8(self) -> int:
+        return U8.unpack_from(self.b, self.skip(1))[0]
+
+    def u16(self) -> int:
+        return U16.unpack_from(self.b, self.skip(2))[0]
+
+    def u32(self) -> int:
+        return U32.unpack_from(self.b, self.skip(4))[0]
+
+    def i64(self) -> int:
+        return I64.unpack_from(self.b, self.skip(8))[0]
+
+    def u32s(self, n: int) -> tuple[int, ...]:
+        return unpack_from(f'<{n}I', self.b, self.skip(4*n))
+
+    def unpack_many(self, t: St, n: int) -> list[tuple[Any, ...]]:
+        '''n records of t'''
+        beg = self.skip(t.size*n)
+        return list(t.iter_unpack(self.v[beg:self.idx]))
+
     def byte(self):
         b = self.v[self.idx]
         self.idx += 1
         return b
 
-    def si(self, n: int):
+    def si(self, n: int) -> int:
+        if (t := SSInts.get(n)) is not None:
+            return t.unpack_from(self.b, self.skip(n))[0]
         return int.from_bytes(self.read(n), LE, signed=True)
 
-    def ui(self, n: int):
+    def ui(self, n: int) -> int:
+        if (t := SUInts.get(n)) is not None:
+            return t.unpack_from(self.b, self.skip(n))[0]
         return int.from_bytes(self.read(n), LE, signed=False)
 
     def bz(self):
@@ -77,10 +111,10 @@ class Rdr:
         return str(self.read(n), enc or self.enc)
 
     def unpack(self, t: St):
-        return t.unpack(self.read(t.size))
+        return t.unpack_from(self.b, self.skip(t.size))
 
     def f64(self) -> float:
-        return F64.unpack(self.read(8))[0]
+        return F64.unpack_from(self.b, self.skip(8))[0]
 
     def assert_eof(self, ver: int):
         i = self.idx
@@ -1,6 +1,7 @@
 from .common import *
 from enum import nonmember
-from collections.abc import Buffer, Sized
+from typing import Any
+from collections.abc import Buffer, Sized, Iterable
 
 
 class Typ(IntEnum):
@@ -62,26 +63,57 @@ TIns = IOpB | tuple[IOpV, Tyq, int] | str | Buffer \
     | tuple[Lit[IOpA.F64], float] | tuple[IOpA, int]
 
 
+OpB, OpV, OpA = 0, 1, 2
+SOpA = {1: St('<b'), 2: St('<h'), 4: St('<i'), 8: St('<q')}
+# 3-byte opcode -> (kind, op, operand unpack_from, instruction size), all but strings (low byte IOpA.STR)
+OpcTab: dict[int, tuple[int, Any, Any, int]] = {
+    **{o.value: (OpB, o, None, 4 if o == IOpB.IDXEND else 3) for o in IOpB},
+    **{o.value: (OpV, o, STyqIdx.unpack_from, 3+STyqIdx.size) for o in IOpV},
+    **{o.value: (OpA, o, (F64 if o == IOpA.F64 else SOpA[o >> 8]).unpack_from, 3+(o >> 8)) for o in IOpA},
+}
+TyqTab = {t.value: t for t in Tyq}
+# opcode -> (opcode bytes zero-padded to the instruction size, operand pack_into)
+EncTab: dict[int, tuple[bytes, Any]] = {
+    **{o: (o.to_bytes(4 if o == IOpB.IDXEND else 3, LE), None) for o in IOpB},
+    **{o: (o.to_bytes(3, LE).ljust(3+STyqIdx.size, b'\0'), STyqIdx.pack_into) for o in IOpV},
+    **{o: (o.to_bytes(3, LE).ljust(3+(o >> 8), b'\0'), (F64 if o == IOpA.F64 else SOpA[o >> 8]).pack_into)
+       for o in IOpA},
+}
+
+
 def read_ins(r: Rdr) -> TIns:
-    if (tri := r.ui(3)) in IOpB:
-        r.idx += tri == IOpB.IDXEND
-        return IOpB(tri)
-    if tri in IOpV:
-        tyq, idx = r.unpack(STyqIdx)
-        return (IOpV(tri), Tyq(tyq), idx)
-    match divmod(tri, 0x100):
-        case (l, IOpA.STR): return r.str(l)
-        case (8, 0x46): return (IOpA.F64, r.f64())  # 08, 46
-        case (n, _): return (IOpA(tri), r.si(n))
-
-
-def many_ins(r: Rdr) -> list[TIns]:
-    l = len(r.b)
-    # if l > 0:
-    #     print(*map(hex, r.b))
+    ins = many_ins(r, 1)
+    assert ins, f'read: no instruction at {r.idx}'
+    return ins[0]
+
+
+def many_ins(r: Rdr, n: int = -1) -> list[TIns]:
+    '''up to n instructions (-1: to the end)'''
+    b, i, l, enc = r.b, r.idx, len(r.b), r.enc
+    tab, tyqs = OpcTab, TyqTab
     lst: list[TIns] = []
-    while r.idx < l:
-        lst.append(read_ins(r))
+    while i < l and n != 0:
+        n -= 1
+        assert i+3 <= l, f'read: truncated opcode, want=3, got={l-i}, at={i}'
+        tri = b[i] | b[i+1] << 8 | b[i+2] << 16
+        if (t := tab.get(tri)) is None:
+            assert tri & 0xff == IOpA.STR, f'unknown opcode: {tri:0>6x}, at={i}'
+            j = i+3+(tri >> 8)
+            assert len(sb := b[i+3:j]) == j-i-3, f'read: want={j-i-3}, got={len(sb)}, at={i+3}'
+            lst.append(str(sb, enc))
+            i = j
+            continue
+        kind, op, unp, size = t
+        assert i+size <= l, f'read: truncated {op!r}, want={size}, got={l-i}, at={i}'
+        if kind == OpB:
+            lst.append(op)
+        elif kind == OpV:
+            tyq, idx = unp(b, i+3)
+            lst.append((op, tyqs[tyq], idx))
+        else:
+            lst.append((op, unp(b, i+3)[0]))
+        i += size
+    r.idx = i
     return lst
 
 
@@ -99,11 +131,38 @@ def ins_tob(ins: TIns, e: str):
         case (v, tyq, idx): return v.to_bytes(3, LE)+STyqIdx.pack(tyq, idx)
 
 
+def ins_into(lst: Iterable[TIns], buf: bytearray, e: str, refs: list[tuple[int, int]] | None = None):
+    '''append the encoding of lst to buf, same bytes as ins_tob;
+    refs: gets (offset in buf of the u16 index, index) of every variable reference'''
+    tab, sopc = EncTab, SOpcLen.pack
+    for ins in lst:
+        if type(ins) is tuple:
+            pre, pk = tab[ins[0]]
+            i = len(buf)
+            buf += pre
+            if len(ins) == 3:
+                pk(buf, i+3, ins[1], ins[2])
+                if refs is not None:
+                    refs.append((i+4, ins[2]))
+            else:
+                pk(buf, i+3, ins[1])
+        elif isinstance(ins, int):
+            buf += tab[ins][0]
+        else:
+            if isinstance(ins, str):
+                ins = bytes(ins, e)
+            assert isinstance(ins, Buffer) and isinstance(ins, Sized)
+            buf += sopc(IOpA.STR, len(ins))
+            buf += ins
+    return buf
+
+
 STRV_TRANS = {ord('\\'): '\\\\'}
 
 
 class Ins:
     to_b = staticmethod(ins_tob)
+    into = staticmethod(ins_into)
     read = staticmethod(read_ins)
     read_many = staticmethod(many_ins)
 
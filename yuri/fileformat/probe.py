@@ -0,0 +1,148 @@
+from .common import *
+from typing import Any, Iterable
+from .ypf import Arc, YstbName
+from .ysvr import YSVR
+from .ystl import YSTL
+from .ystb import SYstbHead, YstbMagic
+import re
+from os import path, listdir
+from struct import unpack_from
+from collections import Counter
+from collections.abc import Buffer
+# versions at which some reader changes layout: YPF tables/hashes, YSTB sections, YSTL, YSVR
+VerCuts = (200, 265, 290, 291, 300, 474, 477, 481, 500, 501, 600)
+VerClasses = [range(a, b) for a, b in zip(VerCuts, VerCuts[1:])]
+YstbFile = re.compile(r'yst\d{5}\.ybn', re.IGNORECASE)
+NLnoProbe = 16  # leading line numbers of each script used to recover the key
+NCmdProbe = 1024  # v2xx: leading bytes of the command section
+
+
+@dataclass(slots=True)
+class Probe:
+    ypf_ver: int | None  # in the YPF header
+    ypf: list[range]  # classes in which the YPF table parses
+    declared: Counter[int]  # versions in the headers of ysbin files
+    ranks: list[tuple[range, int]]  # (version class, checks passed), best first
+    nchk: int  # checks done
+    key: int | None  # YSTB key
+
+    @property
+    def ver(self) -> int | None:
+        '''best guess for the ysbin version, a declared one if it falls in the best class'''
+        if not self.ranks:
+            return None
+        best = self.ranks[0][0]
+        return next((v for v, _ in self.declared.most_common() if v in best), best.start)
+
+    def print(self, f: TextIO = stdout):
+        f.write(f'YPF header ver={self.ypf_ver}, parses as: {", ".join(map(fmt_cls, self.ypf))}\n')
+        f.write(f'ysbin declared: {dict(self.declared)}\n')
+        for c, n in self.ranks:
+            f.write(f'{fmt_cls(c):>9}: {n}/{self.nchk}\n')
+        key = 'unknown' if self.key is None else f'0x{self.key:0>8x}'
+        f.write(f'guess ver={self.ver} key={key}\n')
+
+
+def fmt_cls(c: range):
+    return str(c.start) if len(c) == 1 else f'{c.start}-{c.stop-1}'
+
+
+def parses(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> bool:
+    try:
+        fn(*args, **kwargs)
+    except Exception:
+        return False
+    return True
+
+
+def ypf_classes(b: Buffer) -> list[range]:
+    '''classes whose entry table layout and name hash fit, payloads are not read'''
+    return [c for c in VerClasses if parses(lambda v: Arc(b, v=v, verify='none').close(), c.start)]
+
+
+def ystb_layout(b: Buffer, v: int) -> bool:
+    '''only the header: section lengths must be consistent with the layout of v'''
+    b = memoryview(b)
+    if len(b) < 32:
+        return False
+    mag, _, *rest = cast(tuple[bytes, int, int, int, int, int, int, int], SYstbHead.unpack_from(b))
+    if mag != YstbMagic:
+        return False
+    if v < 300:
+        lcmd, lexp, exp_off, *pads = rest
+        return not any(pads) and 32+lcmd == exp_off and 32+lcmd+lexp <= len(b)
+    ncmd, lcmd, larg, lexp, llno, pad = rest
+    return ncmd*4 == lcmd == llno and larg % 12 == 0 and pad == 0 and 32+lcmd+larg+lexp+llno <= len(b)
+
+
+def ystb_key(ystbs: Iterable[Buffer], nlno: int = NLnoProbe) -> int | None:
+    '''v300+: recover the XOR key from the first line numbers of all scripts,
+    these are small and increasing, so the high bytes are mostly the key'''
+    seqs: list[tuple[int, ...]] = []
+    for b in map(memoryview, ystbs):
+        if not ystb_layout(b, 300):
+            continue
+        ncmd, lcmd, larg, lexp = cast(Ints, unpack_from('<4I', b, 8))
+        seqs.append(unpack_from(f'<{min(ncmd, nlno)}I', b, 32+lcmd+larg+lexp))
+    if not (lnos := [x for s in seqs for x in s]):
+        return ystb_key_v200(ystbs)
+    hi = 0
+    for j in (1, 2, 3):
+        hi |= Counter(x >> 8*j & 0xff for x in lnos).most_common(1)[0][0] << 8*j
+
+    def score(k: int):  # most increasing pairs, then smallest line numbers
+        ds = [[x ^ k for x in s] for s in seqs]
+        return sum(a <= b for d in ds for a, b in zip(d, d[1:])), -sum(map(sum, ds))
+    k = max((hi | k0 for k0 in range(256)), key=score)
+    return int.from_bytes(k.to_bytes(4, LE))  # YSTB.read takes the key big endian
+
+
+def ystb_key_v200(ystbs: Iterable[Buffer], ncmd: int = NCmdProbe) -> int | None:
+    '''v2xx: commands and arguments are mostly zero bytes (high bytes of line numbers, offsets, sizes),
+    so the most common byte at each position mod 4 is the key'''
+    cols: list[Counter[int]] = [Counter() for _ in range(4)]
+    for b in map(memoryview, ystbs):
+        if not ystb_layout(b, 200):
+            continue
+        lcmd = cast(int, unpack_from('<I', b, 8)[0])
+        d = bytes(b[32:32+min(lcmd, ncmd)])
+        for j, col in enumerate(cols):
+            col.update(d[j::4])
+    if not cols[3]:
+        return None
+    return int.from_bytes(bytes(col.most_common(1)[0][0] for col in cols))
+
+
+def probe(ysv: Buffer | None, ystl: Buffer | None, ystbs: Seq[Buffer], ypf: Buffer | None = None) -> Probe:
+    '''ysv, ystl: ysbin\\ysv.ybn, ysbin\\yst_list.ybn; ystbs: some or all ysbin\\yst?????.ybn'''
+    declared = Counter(cast(int, unpack_from('<I', b, 4)[0]) for b in (ysv, ystl, *ystbs) if b is not None)
+    chks: list[Callable[[int], bool]] = []
+    if ysv is not None:
+        chks.append(lambda v, d=bytes(ysv): parses(YSVR.read, Rdr(d), v=v))
+    if ystl is not None:
+        chks.append(lambda v, d=bytes(ystl): parses(YSTL.read, Rdr(d), v=v))
+    chks.extend((lambda v, b=b: ystb_layout(b, v)) for b in ystbs)
+    ranks = [(c, sum(chk(c.start) for chk in chks)) for c in VerClasses]
+    ranks.sort(key=lambda t: (-t[1], not any(v in t[0] for v in declared)))
+    key = ystb_key(ystbs)
+    ypf_ver = None if ypf is None else cast(int, unpack_from('<I', ypf, 4)[0])
+    return Probe(ypf_ver, [] if ypf is None else ypf_classes(ypf), declared, ranks, len(chks), key)
+
+
+def probe_arc(arc: Arc, nscr: int | None = None) -> Probe:
+    '''nscr: only look at that many scripts'''
+    def get(name: str):
+        return None if (e := arc.find(name)) is None else arc.data(e)
+    ystbs = [arc.data(e) for e in [e for e in arc if YstbName.fullmatch(e.name)][:nscr]]
+    return probe(get(R'ysbin\ysv.ybn'), get(R'ysbin\yst_list.ybn'), ystbs, arc.buf)
+
+
+def probe_dir(root: str, nscr: int | None = None) -> Probe:
+    '''root: the extracted ysbin folder'''
+    def get(name: str):
+        if not path.isfile(fn := path.join(root, name)):
+            return None
+        with open(fn, 'rb') as f:
+            return f.read()
+    names = sorted(n for n in listdir(root) if YstbFile.fullmatch(n))[:nscr]
+    return probe(get('ysv.ybn'), get('yst_list.ybn'), [cast(bytes, get(n)) for n in names])
@@ -1,14 +1,22 @@
 from __future__ import annotations
 from .common import *
-from io import BytesIO
+import re
+from typing import Any, Iterable, Container
+from functools import partial
+from hashlib import blake2b
+from concurrent.futures import ThreadPoolExecutor
+from io import UnsupportedOperation
+from mmap import mmap, ACCESS_READ
+from zlib import compress as zcompress
 from struct import Struct
 from collections.abc import Buffer
 from murmurhash2 import murmurhash2 as _mmh2
-Ent = tuple[str, int, int, bytes, int]  # name, k, c, data, l
+Ent = tuple[str, int, int, Buffer, int]  # name, k, c, data (bytes, or a view into an Arc), l
+Verify = Lit['none', 'lazy', 'full']  # lazy: Arc checks data_hash on first access, read() checks all
 try:
     import deflate
     def ddec(b: Buffer, ul: int): return deflate.zlib_decompress(b, ul)
-    def dcom(b: Buffer): return deflate.zlib_compress(b, 12)
+    def dcom(b: Buffer, level: int = 12): return deflate.zlib_compress(b, level)
     compress = dcom
     decompress = ddec
     crc32 = deflate.crc32
@@ -16,14 +24,14 @@ try:
 except ModuleNotFoundError:
     from zlib import crc32, adler32, compress as zcom_, decompress as zdec_
     def decompress(b: Buffer, ul: int): return zdec_(b)
-    def compress(b: Buffer): return zcom_(b, level=9)
+    def compress(b: Buffer, level: int = 9): return zcom_(b, level=min(level, 9))
 
 
 def make_swap(*args: tuple[int, int]):
     bs = bytearray(range(256))
     for i, j in args:
         bs[i], bs[j] = bs[j], bs[i]
-    return bs
+    return bytes(bs)
 
 
 YpfMagic = b'YPF\0'
@@ -35,17 +43,29 @@ TEntName = tuple[int, int]
 SEnt_32B = Struct('<BBIIII')
 SEnt_64B = Struct('<BBIIQI')
 TEnt = tuple[int, int, int, int, int, int]
-THashFn = Callable[[bytes, int], int | None]
+THashFn = Callable[[Buffer, int], int | None]
+# nl_map, nb_xor, h_name, h_file, f_ent, s_ent
+TConsts = tuple[bytes, bytes, THashFn, THashFn, Callable[[BinIO], TEnt], Struct]
 NLSwaps = ((6, 53), (9, 11), (12, 16), (13, 19), (21, 27), (28, 30), (32, 35), (38, 41), (44, 47))
 NLMapV000 = make_swap((3, 72), (17, 25), (46, 50), *NLSwaps)
 NLMapV500 = make_swap((3, 10), (17, 24), (20, 46), *NLSwaps)
 NBXorV000 = bytes(i ^ 0xff for i in range(256))
 NBXorV290 = bytes(c ^ 0x40 for c in NBXorV000)
 NBXorV500 = bytes(c ^ 0x36 for c in NBXorV000)
-def no_hash(d: bytes, e: int): return None
-def hashA32(d: bytes, e: int): return h if (h := adler32(d)) != e else None
-def hashCRC(d: bytes, e: int): return h if (h := crc32(d, 0)) != e else None
-def hashMMH(d: bytes, e: int): return h if (h := _mmh2(d, 0)) != e else None
+def no_hash(d: Buffer, e: int): return None
+def hashA32(d: Buffer, e: int): return h if (h := adler32(d)) != e else None
+def hashCRC(d: Buffer, e: int): return h if (h := crc32(d, 0)) != e else None
+def hashMMH(d: Buffer, e: int): return h if (h := _mmh2(bytes(d), 0)) != e else None
+def blen(d: Buffer) -> int: return memoryview(d).nbytes
+
+
+def hash_of(h: THashFn, d: Buffer) -> int | None:
+    '''the value of a check-style hash function, None if it computes none (no_hash)'''
+    if (x := h(d, 0)) is not None:
+        return x
+    return None if h(d, 1) is None else 0
+
+
 def entname(f: BinIO) -> TEntName: return SEntName.unpack(f.read(5))
 def ent_32b(f: BinIO) -> TEnt: return SEnt_32B.unpack(f.read(18))
 def ent_64b(f: BinIO) -> TEnt: return SEnt_64B.unpack(f.read(22))
@@ -64,7 +84,7 @@ def ver_hash(v: int, h: THashFn | None = None):
 
 def ver_consts(v: int,
                nl_map: bytes | None = None, nb_xor: bytes | None = None,
-               h_name: THashFn | None = None, h_file: THashFn | None = None):
+               h_name: THashFn | None = None, h_file: THashFn | None = None) -> TConsts:
     h_name = ver_hash(v, h_name)
     if v >= 477:  # real number ?
         # 476: Natsuzora Asterism Trial - CRC32
@@ -80,66 +100,491 @@ def ver_consts(v: int,
     return nl_map, nb_xor, h_name, h_file, f_ent, s_ent
 
 
-def read(f: BinIO, *, v: int | None = None, enc: str = 'cp932',
-         nl_map: bytes | None = None, nb_xor: bytes | None = None,
-         h_name: THashFn | None = None, h_file: THashFn | None = None,
-         log: TextIO | None = None, do_decompress: bool = True):
-    mag, v_, n, l, pad = cast(TYpfHead, SYpfHead.unpack(f.read(32)))
+def par_map(fn: Callable[..., Any], nthread: int | None, *its: Seq[Any]) -> list[Any]:
+    '''in order; nthread=None: executor default; fn should release the GIL (libdeflate does)'''
+    if nthread == 1 or len(its[0]) <= 1:
+        return list(map(fn, *its))
+    with ThreadPoolExecutor(nthread) as ex:
+        return list(ex.map(fn, *its))
+
+
+@dataclass(slots=True)
+class Rec:
+    name: str
+    k: int
+    c: int
+    ul: int
+    cl: int
+    off: int
+    fh: int  # data_hash
+    nh: int  # name_hash
+
+
+def read_head(b: Buffer, v: int | None):
+    mag, v_, n, l, pad = cast(TYpfHead, SYpfHead.unpack(b))
     assert mag == YpfMagic, f'not YPF magic: {mag}'
     assert pad == YpfPad16, f'nonzero in padding: {pad}'
     assert (v := v or v_) in VerRange, f'unsupported version: {v}'
     assert (l := l-32 if v >= 300 else l) >= 0, f'wrong version ?'
-    assert (g := len(d := f.read(l))) == l, f'ents: want {l}, got {g}'
-    nl_map, nb_xor, h_name, h_file, f_ent, _ = ver_consts(v, nl_map, nb_xor, h_name, h_file)
-    fe = BytesIO(d)
-    ents: list[Ent] = []
+    return v, n, l
+
+
+def read_table(d: bytes, n: int, enc: str, nl_map: bytes, nb_xor: bytes, h_name: THashFn, s_ent: Struct,
+               want: Container[int] | None = None):
+    '''want: only entries with these name_hash, the names of others are not decoded'''
+    i = 0
+    recs: list[Rec] = []
     for _ in range(n):
-        nh, nl = entname(fe)
-        nb = fe.read(nl_map[nl ^ 0xff]).translate(nb_xor)
+        nh, nl = cast(TEntName, SEntName.unpack_from(d, i))
+        beg = i+SEntName.size
+        i = beg+nl_map[nl ^ 0xff]
+        if want is not None and nh not in want:
+            i += s_ent.size
+            continue
+        nb = d[beg:i].translate(nb_xor)
         assert (h := h_name(nb, nh)) is None, f'hash(name): expect {nh:0>8x}, actual {h:0>8x}, name={nb}'
         name = nb.decode(enc)
-        k, c, ul, cl, off, fh = f_ent(fe)
-        f.seek(off)
+        k, c, ul, cl, off, fh = cast(TEnt, s_ent.unpack_from(d, i))
+        i += s_ent.size
         assert c <= 1, f'unknown compression {c}, file: {name}'
-        assert (g := len(d := f.read(cl))) == cl, f'file: want {cl}, got {g}, file: {name}'
-        assert (h := h_file(d, fh)) is None, f'hash(file): expect {fh:0>8x}, actual {h:0>8x}, file: {name}'
-        if do_decompress:
-            assert (g := len(d := decompress(d, ul) if c else d)) == ul, f'comp: want {ul}, got {g}, file: {name}'
-        elif c != 0:
-            c = -1
-        ents.append((name, k, c, d, ul))
-        _ = log and log.write(f'k={k} c={c} ul={ul:<7} cl={cl:<7} file: {name}\n')
-    return ents, v
+        recs.append(Rec(name, k, c, ul, cl, off, fh, nh))
+    return recs
 
 
-def make(ents: Seq[Ent], v: int, f: BinIO, *, enc: str = 'cp932',
+def read(f: BinIO, *, v: int | None = None, enc: str = 'cp932',
          nl_map: bytes | None = None, nb_xor: bytes | None = None,
          h_name: THashFn | None = None, h_file: THashFn | None = None,
-         comp: Callable[[Buffer], bytes] = compress, force_comp: bool = False, log: TextIO | None = None):
-    '''Ent[k=-1]: pass in already compressed data'''
-    assert v in VerRange, f'unsupported version: {v}'
-    off = 32  # name, k, c, data, ul, data_hash
-    fents: list[tuple[bytes, int, int, bytes, int, int]] = []
+         log: TextIO | None = None, do_decompress: bool = True,
+         verify: Verify = 'full', nthread: int | None = 1):
+    '''verify: 'lazy' checks all like 'full', as every payload is read here;
+    nthread=1: one entry at a time, else the stored payloads are all read first, then loaded in parallel'''
+    v, n, l = read_head(f.read(32), v)
+    assert (g := len(d := f.read(l))) == l, f'ents: want {l}, got {g}'
     nl_map, nb_xor, h_name, h_file, _, s_ent = ver_consts(v, nl_map, nb_xor, h_name, h_file)
-    for name, k, c, d, ul in ents:
-        c = 1 if c == 0 and force_comp else c
+    h_file = no_hash if verify == 'none' else h_file
+    recs = read_table(d, n, enc, nl_map, nb_xor, h_name, s_ent)
+
+    def fetch(e: Rec) -> bytes:
+        f.seek(e.off)
+        assert (g := len(d := f.read(cl := e.cl))) == cl, f'file: want {cl}, got {g}, file: {e.name}'
+        return d
+
+    def load(e: Rec, d: Buffer) -> Buffer:
+        assert (h := h_file(d, e.fh)) is None, f'hash(file): expect {e.fh:0>8x}, actual {h:0>8x}, file: {e.name}'
+        if do_decompress:
+            ul = e.ul
+            assert (g := blen(d := decompress(d, ul) if e.c else d)) == ul, f'comp: want {ul}, got {g}, file: {e.name}'
+        return d
+
+    if nthread == 1:
+        datas: Iterable[Buffer] = (load(e, fetch(e)) for e in recs)
+    else:
+        datas = par_map(load, nthread, recs, [fetch(e) for e in recs])
+    ents: list[Ent] = []
+    for e, d in zip(recs, datas):
+        name, k, c, ul = e.name, e.k, e.c, e.ul
+        c = -1 if c != 0 and not do_decompress else c
+        ents.append((name, k, c, d, ul))
+        _ = log and log.write(f'k={k} c={c} ul={ul:<7} cl={e.cl:<7} file: {name}\n')
+    return ents, v
+
+
+class Arc:
+    '''YPF with only the entry table parsed, payloads are sliced from the (mapped) buffer on access.
+    Entries are looked up by their stored name_hash, by name if h_name computes none'''
+    __slots__ = ['ver', 'enc', 'consts', 'recs', 'by_hash', 'by_name', 'h_name', 'h_file', 'checked', 'buf', 'mm']
+    ver: int
+    enc: str
+    consts: TConsts  # as opened with, for rewriting it (patch)
+    recs: list[Rec]
+    by_hash: dict[int, list[Rec]]
+    by_name: dict[str, Rec] | None  # h_name computes no hashes (e.g. no_hash)
+    h_name: THashFn
+    h_file: THashFn
+    checked: set[int]  # offsets with verified data_hash
+    buf: memoryview
+    mm: mmap | None
+
+    @classmethod
+    def from_bio(cls, f: BinIO, **kwargs: Any):
+        try:
+            mm = mmap(f.fileno(), 0, access=ACCESS_READ)
+        except UnsupportedOperation:  # BytesIO
+            f.seek(0)
+            return cls(f.read(), **kwargs)
+        return cls(mm, **kwargs)
+
+    def __init__(self, b: Buffer, *, v: int | None = None, enc: str = 'cp932',
+                 nl_map: bytes | None = None, nb_xor: bytes | None = None,
+                 h_name: THashFn | None = None, h_file: THashFn | None = None,
+                 verify: Verify = 'lazy', nthread: int | None = 1, only: Iterable[str] | None = None):
+        '''only: parse just the entries with these names (by name_hash, if h_name computes it)'''
+        self.mm = b if isinstance(b, mmap) else None
+        self.buf = buf = memoryview(b)
+        v, n, l = read_head(buf[0:32], v)
+        assert (g := len(d := buf[32:32+l])) == l, f'ents: want {l}, got {g}'
+        self.consts = nl_map, nb_xor, h_name, h_file, _, s_ent = ver_consts(v, nl_map, nb_xor, h_name, h_file)
+        self.ver, self.enc, self.h_name = v, enc, h_name
+        self.h_file = no_hash if verify == 'none' else h_file
+        self.checked = set()
+        hashed = hash_of(h_name, b'') is not None
+        only = None if only is None else set(only)
+        want = None if only is None or not hashed else {hash_of(h_name, name.encode(enc)) or 0 for name in only}
+        self.recs = read_table(d.tobytes(), n, enc, nl_map, nb_xor, h_name, s_ent, want)
+        if only is not None and not hashed:
+            self.recs = [e for e in self.recs if e.name in only]
+        self.by_hash = {}
+        self.by_name = None if hashed else {}
+        for e in self.recs:
+            self.by_hash.setdefault(e.nh, []).append(e)
+            if self.by_name is not None:
+                self.by_name.setdefault(e.name, e)
+        if verify == 'full':
+            par_map(self.raw, nthread, self.recs)
+
+    def __len__(self): return len(self.recs)
+    def __iter__(self): return iter(self.recs)
+    def __contains__(self, name: str): return self.find(name) is not None
+    def __enter__(self): return self
+    def __exit__(self, *_: Any): self.close()
+
+    def __getitem__(self, name: str):
+        if (e := self.find(name)) is None:
+            raise KeyError(name)
+        return e
+
+    def name_hash(self, name: str) -> int | None:
+        '''None: h_name computes no hashes'''
+        return hash_of(self.h_name, name.encode(self.enc))
+
+    def find(self, name: str) -> Rec | None:
+        if self.by_name is not None:
+            return self.by_name.get(name)
+        for e in self.by_hash.get(self.name_hash(name) or 0, ()):
+            if e.name == name:
+                return e
+        return None
+
+    def raw(self, e: Rec) -> memoryview:
+        '''stored (possibly compressed) bytes, valid until close()'''
+        name, cl, fh, off = e.name, e.cl, e.fh, e.off
+        assert (g := len(d := self.buf[off:off+cl])) == cl, f'file: want {cl}, got {g}, file: {name}'
+        if off not in self.checked:
+            assert (h := self.h_file(d, fh)) is None, f'hash(file): expect {fh:0>8x}, actual {h:0>8x}, file: {name}'
+            self.checked.add(off)
+        return d
+
+    def data(self, e: Rec) -> Buffer:
+        ul = e.ul
+        if not e.c:
+            return self.raw(e)
+        assert (g := len(d := decompress(self.raw(e), ul))) == ul, f'comp: want {ul}, got {g}, file: {e.name}'
+        return d
+
+    def ent(self, e: Rec, do_decompress: bool = True) -> Ent:
+        if do_decompress:
+            return (e.name, e.k, e.c, self.data(e), e.ul)
+        return (e.name, e.k, -1 if e.c else 0, self.raw(e), e.ul)
+
+    def ents(self, recs: Seq[Rec] | None = None, do_decompress: bool = True, nthread: int | None = 1):
+        return par_map(partial(self.ent, do_decompress=do_decompress), nthread, self.recs if recs is None else recs)
+
+    def close(self):
+        self.buf.release()
+        if self.mm is not None:
+            self.mm.close()
+
+
+YstbName = re.compile(r'ysbin\\yst\d{5}\.ybn', re.IGNORECASE)
+
+
+@dataclass(slots=True)
+class Diff:
+    added: list[str]
+    removed: list[str]
+    changed: list[str]
+    same: list[str]
+    hashed: bool  # data_hash compared, else (different hash functions) only sizes and flags
+
+    def scripts(self) -> list[str]:
+        '''added or changed ysbin\\yst?????.ybn'''
+        return [n for n in self.added + self.changed if YstbName.fullmatch(n)]
+
+    def report(self, f: TextIO):
+        for mark, names in (('+', self.added), ('-', self.removed), ('*', self.changed)):
+            for n in names:
+                f.write(f'{mark} {n}\n')
+        f.write(f'added {len(self.added)}, removed {len(self.removed)}, changed {len(self.changed)}, '
+                f'same {len(self.same)}{"" if self.hashed else " (sizes only)"}\n')
+
+
+def diff(a: Arc, b: Arc) -> Diff:
+    '''compare two archives by their entry tables only, payloads are not read'''
+    hashed = a.consts[3] is b.consts[3]  # the h_file each was opened with, a.h_file is no_hash for verify='none'
+    a_names = {e.name: e for e in a}
+    b_names = {e.name: e for e in b}
+    added = [n for n in b_names if n not in a_names]
+    removed = [n for n in a_names if n not in b_names]
+    changed: list[str] = []
+    same: list[str] = []
+    for n, x in a_names.items():
+        if (y := b_names.get(n)) is None:
+            continue
+        eq = (x.k, x.c, x.ul, x.cl) == (y.k, y.c, y.ul, y.cl) and (not hashed or x.fh == y.fh)
+        (same if eq else changed).append(n)
+    return Diff(added, removed, changed, same, hashed)
+
+
+FEnt = tuple[bytes, int, int, Buffer, int, int]  # name, k, c, stored data, ul, data_hash
+
+
+@dataclass(slots=True)
+class CompStats:
+    n_skip: int = 0  # not compressed, by sniff
+    b_skip: int = 0
+    n_comp: int = 0  # compressed
+    b_comp: int = 0
+    b_out: int = 0   # stored size of compressed, after keeping raw ones not smaller
+    n_raw: int = 0   # compressed, but not smaller
+
+    def __str__(self):
+        return (f'skipped {self.n_skip} ({self.b_skip} bytes), compressed {self.n_comp} '
+                f'({self.b_comp} -> {self.b_out} bytes, {self.n_raw} kept raw)')
+
+
+MediaMagics = (b'OggS', b'\x89PNG', b'\xff\xd8\xff', b'fLaC', b'ID3', b'\xff\xfb', b'\xff\xf3',
+               b'PK\x03\x04', b'\x1f\x8b', b'\x1a\x45\xdf\xa3', b'7z\xbc\xaf', b'BZh', b'\xfd7zXZ')
+SniffSample = 4096
+
+
+def incompressible(d: Buffer, ratio: float = 0.97) -> bool:
+    '''known compressed media by magic, otherwise a fast compression of a few samples'''
+    v = memoryview(d)
+    head = v[0:12].tobytes()
+    if head.startswith(MediaMagics) or head[8:12] == b'WEBP' or head[4:8] == b'ftyp':
+        return True
+    if (l := len(v)) <= 3*SniffSample:
+        return False
+    mid = l//2
+    sample = b''.join((v[0:SniffSample], v[mid:mid+SniffSample], v[l-SniffSample:l]))
+    return len(zcompress(sample, 1)) >= len(sample)*ratio
+
+
+def content_key(c: int, d: Buffer):
+    return c, blake2b(d, digest_size=16).digest()
+
+
+def prep(ents: Seq[Ent], enc: str, h_file: THashFn, comp: Callable[[Buffer], bytes], force_comp: bool,
+         log: TextIO | None, nthread: int | None, dedup: bool = False,
+         sniff: Callable[[Buffer], bool] | None = None, stats: CompStats | None = None) -> list[FEnt]:
+    '''dedup: entries equal to an earlier one share its (same object) stored data
+    sniff: payloads for which it returns True are stored without trying to compress'''
+    fents: list[FEnt] = []
+    cs = [1 if c == 0 and force_comp else c for _, _, c, _, _ in ents]
+    firsts = list(range(len(ents)))
+    if dedup:
+        seen: dict[tuple[int, bytes], int] = {}
+        firsts = [seen.setdefault(content_key(c, e[3]), i) for i, (e, c) in enumerate(zip(ents, cs))]
+    if sniff is not None:
+        for i, (e, c) in enumerate(zip(ents, cs)):
+            if c == 1 and firsts[i] == i and sniff(e[3]):
+                cs[i] = 0
+                if stats is not None:
+                    stats.n_skip += 1
+                    stats.b_skip += blen(e[3])
+    todo = [e[3] for i, (e, c) in enumerate(zip(ents, cs)) if c == 1 and firsts[i] == i]
+    comped = iter(par_map(comp, nthread, todo))
+    for (name, k, _, d, ul), c, j in zip(ents, cs, firsts):
+        if j < len(fents):
+            _, _, c, d, _, fh = fents[j]
+            fents.append((name.encode(enc), k, c, d, ul, fh))
+            _ = log and log.write(f'k={k} c={c} ul={ul:<7} cl={blen(d):<7} same: {name}\n')
+            continue
         match c:
-            case -1: c, cl = 1, len(d)
-            case 0: assert (cl := len(d)) == ul, f'len(d)={cl}, ul={ul}, file: {name}'
+            case -1: c = 1
+            case 0: assert (cl := blen(d)) == ul, f'len(d)={cl}, ul={ul}, file: {name}'
             case 1:
-                assert (ld := len(d)) == ul, f'len(d)={ld}, ul={ul}, file: {name}'
-                c, d = (1, cd) if len(cd := comp(d)) < ul else (0, d)
+                assert (ld := blen(d)) == ul, f'len(d)={ld}, ul={ul}, file: {name}'
+                c, d = (1, cd) if len(cd := next(comped)) < ul else (0, d)
+                if stats is not None:
+                    stats.n_comp += 1
+                    stats.b_comp += ul
+                    stats.b_out += blen(d)
+                    stats.n_raw += c == 0
             case _: assert False, f'unknown compression: {c}, file: {name}'
         d = bytes(d) if isinstance(d, bytearray) else d
-        fents.append((n := name.encode(enc), k, c, d, ul, h_file(d, 0) or 0))
-        off += SEntName.size + len(n) + s_ent.size
-        _ = log and log.write(f'k={k} c={c} ul={ul:<7} cl={len(d):<7} file: {name}\n')
-    siz = off if v >= 300 else off-32
-    f.write(SYpfHead.pack(YpfMagic, v, len(fents), siz, YpfPad16))
-    for nb, k, c, d, ul, fh in fents:
+        fents.append((name.encode(enc), k, c, d, ul, h_file(d, 0) or 0))
+        _ = log and log.write(f'k={k} c={c} ul={ul:<7} cl={blen(d):<7} file: {name}\n')
+    _ = log and stats and log.write(f'{stats}\n')
+    return fents
+
+
+FRow = tuple[bytes, int, int, int, int, int, int]  # name, k, c, ul, cl, off, data_hash
+
+
+def table_end(nbs: Iterable[bytes], s_ent: Struct):
+    return 32 + sum(SEntName.size + len(nb) + s_ent.size for nb in nbs)
+
+
+def write_table(f: BinIO, v: int, rows: Seq[FRow], nl_map: bytes, nb_xor: bytes, h_name: THashFn, s_ent: Struct):
+    end = table_end((r[0] for r in rows), s_ent)
+    f.write(SYpfHead.pack(YpfMagic, v, len(rows), end if v >= 300 else end-32, YpfPad16))
+    for nb, k, c, ul, cl, off, fh in rows:
         f.write(SEntName.pack(h_name(nb, 0) or 0, nl_map[len(nb)] ^ 0xff))
         f.write(nb.translate(nb_xor))
-        f.write(s_ent.pack(k, c, ul, cl := len(d), off, fh))
+        f.write(s_ent.pack(k, c, ul, cl, off, fh))
+
+
+def write(fents: Seq[FEnt], v: int, f: BinIO, nl_map: bytes, nb_xor: bytes, h_name: THashFn, s_ent: Struct,
+          log: TextIO | None = None, dedup: bool = False):
+    '''dedup: entries with the very same data object are stored once'''
+    off = table_end((t[0] for t in fents), s_ent)
+    rows: list[FRow] = []
+    blobs: list[Buffer] = []
+    offs: dict[int, int] = {}
+    for nb, k, c, d, ul, fh in fents:
+        if dedup and (o := offs.get(id(d))) is not None:
+            rows.append((nb, k, c, ul, blen(d), o, fh))
+            continue
+        offs[id(d)] = off
+        blobs.append(d)
+        rows.append((nb, k, c, ul, cl := blen(d), off, fh))
         off += cl
+    write_table(f, v, rows, nl_map, nb_xor, h_name, s_ent)
     _ = log and log.write('writing\n')
-    f.writelines(t[3] for t in fents)
+    f.writelines(blobs)
+
+
+def leveled(comp: Callable[[Buffer], bytes], level: int | None) -> Callable[[Buffer], bytes]:
+    '''level only applies to the default compress, a custom comp is used as given'''
+    return partial(compress, level=level) if level is not None and comp is compress else comp
+
+
+class Writer:
+    '''Streaming make: the table is reserved for the given names, each payload is written
+    as soon as it is added (in any order), and the table is filled in at close()'''
+    __slots__ = ['f', 'v', 'enc', 'consts', 'comp', 'force_comp', 'log', 'idx', 'rows', 'off', 'seen',
+                 'sniff', 'stats']
+    f: BinIO
+    v: int
+    enc: str
+    consts: TConsts
+    comp: Callable[[Buffer], bytes]
+    force_comp: bool
+    log: TextIO | None
+    idx: dict[str, int]
+    rows: list[FRow | None]
+    off: int
+    seen: dict[tuple[int, bytes], FRow] | None  # for dedup
+    sniff: Callable[[Buffer], bool] | None
+    stats: CompStats | None
+
+    def __init__(self, f: BinIO, v: int, names: Seq[str], *, enc: str = 'cp932',
+                 nl_map: bytes | None = None, nb_xor: bytes | None = None,
+                 h_name: THashFn | None = None, h_file: THashFn | None = None,
+                 comp: Callable[[Buffer], bytes] = compress, force_comp: bool = False, log: TextIO | None = None,
+                 level: int | None = None, dedup: bool = False,
+                 sniff: Callable[[Buffer], bool] | None = None, stats: CompStats | None = None):
+        assert v in VerRange, f'unsupported version: {v}'
+        self.f, self.v, self.enc, self.force_comp, self.log = f, v, enc, force_comp, log
+        self.sniff, self.stats = sniff, stats
+        self.seen = {} if dedup else None
+        self.consts = ver_consts(v, nl_map, nb_xor, h_name, h_file)
+        self.comp = leveled(comp, level)
+        self.idx = {name: i for i, name in enumerate(names)}
+        assert len(self.idx) == len(names), 'duplicate names'
+        self.rows = [None] * len(names)
+        self.off = table_end((name.encode(enc) for name in names), self.consts[5])
+        f.seek(self.off)
+
+    def __enter__(self): return self
+
+    def __exit__(self, typ: type[BaseException] | None, *_: Any):
+        if typ is None:
+            self.close()
+        else:  # no table over partial payloads: leave the file empty, plainly unfinished
+            self.f.seek(0)
+            self.f.truncate()
+
+    def add(self, ent: Ent):
+        name, k, c, d, ul = ent
+        assert self.rows[i := self.idx[name]] is None, f'added twice: {name}'
+        key = None
+        if self.seen is not None:
+            key = content_key(1 if c == 0 and self.force_comp else c, d)
+            if (row := self.seen.get(key)) is not None:
+                _, _, c, _, cl, off, fh = row
+                self.rows[i] = (name.encode(self.enc), k, c, ul, cl, off, fh)
+                _ = self.log and self.log.write(f'k={k} c={c} ul={ul:<7} cl={cl:<7} same: {name}\n')
+                return
+        h_file = self.consts[3]
+        ((nb, k, c, d, ul, fh),) = prep((ent,), self.enc, h_file, self.comp, self.force_comp,
+                                        None, 1, False, self.sniff, self.stats)
+        _ = self.log and self.log.write(f'k={k} c={c} ul={ul:<7} cl={blen(d):<7} file: {name}\n')
+        self.rows[i] = row = (nb, k, c, ul, cl := blen(d), self.off, fh)
+        if self.seen is not None and key is not None:
+            self.seen[key] = row
+        self.f.write(d)
+        self.off += cl
+
+    def close(self):
+        assert not (miss := [n for n, i in self.idx.items() if self.rows[i] is None]), f'not added: {miss}'
+        _ = self.log and self.stats and self.log.write(f'{self.stats}\n')
+        nl_map, nb_xor, h_name, _, _, s_ent = self.consts
+        self.f.seek(0)
+        write_table(self.f, self.v, cast(list[FRow], self.rows), nl_map, nb_xor, h_name, s_ent)
+        self.f.seek(self.off)
+
+
+def make(ents: Seq[Ent], v: int, f: BinIO, *, enc: str = 'cp932',
+         nl_map: bytes | None = None, nb_xor: bytes | None = None,
+         h_name: THashFn | None = None, h_file: THashFn | None = None,
+         comp: Callable[[Buffer], bytes] = compress, force_comp: bool = False, log: TextIO | None = None,
+         level: int | None = None, nthread: int | None = 1, dedup: bool = False,
+         sniff: Callable[[Buffer], bool] | None = None, stats: CompStats | None = None):
+    '''Ent[k=-1]: pass in already compressed data; dedup: store identical payloads once
+    sniff: e.g. incompressible, skip compressing what it flags; stats: filled in'''
+    assert v in VerRange, f'unsupported version: {v}'
+    nl_map, nb_xor, h_name, h_file, _, s_ent = ver_consts(v, nl_map, nb_xor, h_name, h_file)
+    comp = leveled(comp, level)
+    fents = prep(ents, enc, h_file, comp, force_comp, log, nthread, dedup, sniff, stats)
+    write(fents, v, f, nl_map, nb_xor, h_name, s_ent, log, dedup)
+
+
+def patch(src: Arc, f: BinIO, put: Seq[Ent] = (), drop: Iterable[str] = (), *, enc: str | None = None,
+          nl_map: bytes | None = None, nb_xor: bytes | None = None,
+          h_name: THashFn | None = None, h_file: THashFn | None = None,
+          comp: Callable[[Buffer], bytes] = compress, force_comp: bool = False, log: TextIO | None = None,
+          level: int | None = None, nthread: int | None = 1, dedup: bool = False,
+          sniff: Callable[[Buffer], bool] | None = None, stats: CompStats | None = None):
+    '''Rebuild src with put (replaced in place, or appended) and without drop.
+    Other entries are copied as stored, without decompressing or hashing them again,
+    payloads shared in src stay shared; dedup: also among put.
+    enc and the tables/hashes default to those src was opened with.'''
+    v, enc = src.ver, enc or src.enc
+    s_nl_map, s_nb_xor, s_h_name, s_h_file, _, s_ent = src.consts
+    nl_map, nb_xor = nl_map or s_nl_map, nb_xor or s_nb_xor
+    h_name = h_name or (s_h_name if hash_of(s_h_name, b'') is not None else ver_hash(v))
+    h_file = h_file or s_h_file
+    comp = leveled(comp, level)
+    drops = set(drop)
+    assert not (miss := [n for n in drops if n not in src]), f'drop: not in archive: {miss}'
+    news = dict(zip((e[0] for e in put),
+                    prep(put, enc, h_file, comp, force_comp, log, nthread, dedup, sniff, stats)))
+    assert len(news) == len(put), 'put: duplicate names'
+    views: dict[int, memoryview] = {}
+    fents: list[FEnt] = []
+    for e in src:
+        if e.name in drops:
+            continue
+        if (ne := news.pop(e.name, None)) is not None:
+            fents.append(ne)
+            continue
+        off, cl = e.off, e.cl
+        if (d := views.get(off)) is None:
+            d = views[off] = src.buf[off:off+cl]
+        assert (g := len(d)) == cl, f'file: want {cl}, got {g}, file: {e.name}'
+        fents.append((e.name.encode(enc), e.k, e.c, d, e.ul, e.fh))
+        _ = log and log.write(f'k={e.k} c={e.c} ul={e.ul:<7} cl={cl:<7} copy: {e.name}\n')
+    fents.extend(news.values())
+    write(fents, v, f, nl_map, nb_xor, h_name, s_ent, log, True)
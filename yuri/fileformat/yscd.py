@@ -44,7 +44,7 @@ class DVar:
     def read(cls, r: Rdr):
         name = r.sz()
         typ, ndim = r.read(2)
-        return cls(name, Typ(typ), [r.ui(4) for _ in range(ndim)])
+        return cls(name, Typ(typ), list(r.u32s(ndim)))
 
 
 @dataclass(slots=True)
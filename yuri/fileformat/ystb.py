@@ -2,6 +2,11 @@ from .common import *
 from .yscm import MCmd
 from .expr import Typ, TIns, many_ins
 from xor_cipher import cyclic_xor_in_place
+from collections.abc import Buffer
+from dataclasses import field
+from array import array
+from typing import overload
+from sys import byteorder
 SArg = St('<HBBII')
 SArg2xxR = St('<HBB')
 SCmdV200 = St('<BBI')
@@ -10,6 +15,9 @@ KEY_200 = 0x07B4024A
 KEY_290 = 0xD36FAC96
 YstbMagic = b'YSTB'
 SYstbHead = St('<4s7I')
+SLno = St('<I')
+YstcMagic = b'YSTC'
+SYstcHead = St('<4s6I')  # magic, ver, key, ncmd, narg, len(exp), len(meta)
 AOpChar: list[str] = ['=', '+=', '-=', '*=', '/=', '%=', '&=', '|=', '^=']
 
 
@@ -26,29 +34,64 @@ class AOp(IntEnum):
     BXOR = 8
 
 
+Typs = [Typ(t & 0b11) for t in range(256)]
+AOps = list(AOp)
+ArgNone, ArgExpr, ArgWord = 0, 1, 2  # what an argument's expression section range holds
+
+
 @dataclass(slots=True)
 class RArg:
+    '''dat is decoded on first access from src: a view into the expression section, its encoding, is WORD;
+    src is kept afterwards for raw'''
     id: int
     typ: Typ
     aop: AOp
     siz: int
     off: int
-    dat: None | str | list[TIns]
+    _dat: None | str | list[TIns] = None
+    src: tuple[memoryview, str, bool] | None = field(default=None, repr=False, compare=False)
+
+    @property
+    def dat(self) -> None | str | list[TIns]:
+        if self._dat is None and (src := self.src) is not None:
+            v, enc, word = src
+            self._dat = str(v, enc) if word else many_ins(Rdr(v, enc))  # type: ignore
+        return self._dat
+
+    @property
+    def raw(self) -> tuple[str, bytes] | None:
+        '''(encoding, undecoded bytes) of an expression, None for WORD or without src'''
+        if (src := self.src) is None or src[2]:
+            return None
+        return src[1], src[0].tobytes()
+
+    def __repr__(self):
+        return (f'RArg(id={self.id!r}, typ={self.typ!r}, aop={self.aop!r}, '
+                f'siz={self.siz!r}, off={self.off!r}, dat={self.dat!r})')
+
+    def __eq__(self, o: object):
+        if not isinstance(o, RArg):
+            return NotImplemented
+        return (self.id, self.typ, self.aop, self.siz, self.off, self.dat) == \
+            (o.id, o.typ, o.aop, o.siz, o.off, o.dat)
+
+    @classmethod
+    def lazy(cls, id_: int, typ: Typ, aop: AOp, dat: memoryview, siz: int, off: int, enc: str, word: bool = False):
+        assert len(v := dat[off:off+siz]) == siz
+        return cls(id_, typ, aop, siz, off, None, (v, enc, word))
 
     @classmethod
-    def read(cls, r: Rdr, word_enc: str, dat: bytes | None = None, word: bool = False):
-        da = None
+    def read(cls, r: Rdr, word_enc: str, dat: Buffer | None = None, word: bool = False):
         id_, typ, aop, siz, off = r.unpack(SArg)
-        if dat is not None:
-            assert len(dat := dat[off:off+siz]) == siz
-            da = str(dat, word_enc) if word else many_ins(Rdr(dat, r.enc))
         # YSCom used some uninitialized value for typ in var defs
-        return cls(id_, Typ(typ & 0b11), AOp(aop), siz, off, da)
+        if dat is None:
+            return cls(id_, Typ(typ & 0b11), AOp(aop), siz, off, None)
+        return cls.lazy(id_, Typ(typ & 0b11), AOp(aop), memoryview(dat), siz, off, word_enc if word else r.enc, word)
 
     @classmethod
     def readV2xxR(cls, r: Rdr, v290: bool):
         id_, typ, aop = r.unpack(SArg2xxR)
-        siz = r.ui(4) if v290 else 0
+        siz = r.u32() if v290 else 0
         return cls(id_, Typ(typ), AOp(aop), siz, 0, None)
 
 
@@ -61,7 +104,7 @@ class RCmd:
     npar: int  # V3xx: parameter count for GOSUB, RETURN
 
     @classmethod
-    def readV2xx(cls, r: Rdr, dat: bytes, v: int, codes: CmdCodes, word_enc: str):
+    def readV2xx(cls, r: Rdr, dat: Buffer, v: int, codes: CmdCodes, word_enc: str):
         off = r.idx
         c, na, lno = r.unpack(SCmdV200)
         if c == codes.RETURNCODE:
@@ -70,18 +113,50 @@ class RCmd:
         return cls(off, lno, c, cls._readArgs(r, na, dat, c, codes, word_enc), 0)
 
     @classmethod
-    def readV300(cls, r: Rdr, ra: Rdr, rl: Rdr, dat: bytes, codes: CmdCodes, word_enc: str):
-        off = r.idx
-        lno = rl.ui(4)
-        c, na, npar = r.unpack(SCmdV300)
-        # print(c, na, npar)
-        if c == codes.RETURNCODE:
-            assert na == 1
-            return cls(off, lno, c, [RArg.read(ra, word_enc, None)], npar)
-        return cls(off, lno, c, cls._readArgs(ra, na, dat, c, codes, word_enc), npar)
+    def readV300Many(cls, dcmd: Buffer, darg: Buffer, dlno: Buffer, dat: Buffer,
+                     codes: CmdCodes, enc: str, word_enc: str):
+        '''All v300+ commands: the fixed-size sections are unpacked whole
+        into columns, then arguments are grouped per command'''
+        ncmd = memoryview(dcmd).nbytes // SCmdV300.size
+        lnos = SLno.iter_unpack(dlno)
+        args = list(SArg.iter_unpack(darg))
+        mexp = memoryview(dat)
+        j = 0
+        c_ret, c_if, c_else, c_loop, c_word = codes.RETURNCODE, codes.IF, codes.ELSE, codes.LOOP, codes.WORD
+        kinds: dict[int, tuple[int, ...]] = {}
+        cmds: list[RCmd] = []
+        for i, (c, na, npar), (lno,) in zip(range(ncmd), SCmdV300.iter_unpack(dcmd), lnos):
+            if c == c_ret:
+                assert na == 1
+                ks = (ArgNone,)
+            elif (c == c_if or c == c_else) and na == 3:
+                ks = (ArgExpr, ArgNone, ArgNone)
+            elif c == c_else:
+                assert na == 0
+                ks = ()
+            elif c == c_loop:
+                assert na == 2
+                ks = (ArgExpr, ArgNone)
+            elif c == c_word:
+                assert na == 1
+                ks = (ArgWord,)
+            elif (ks := kinds.get(na)) is None:
+                ks = kinds[na] = (ArgExpr,)*na
+            rargs: list[RArg] = []
+            for kind in ks:
+                id_, typ, aop, siz, off = args[j]
+                j += 1
+                if kind == ArgNone:
+                    rargs.append(RArg(id_, Typs[typ], AOps[aop], siz, off))
+                elif kind == ArgWord:
+                    rargs.append(RArg.lazy(id_, Typs[typ], AOps[aop], mexp, siz, off, word_enc, True))
+                else:
+                    rargs.append(RArg.lazy(id_, Typs[typ], AOps[aop], mexp, siz, off, enc))
+            cmds.append(cls(i*SCmdV300.size, lno, c, rargs, npar))
+        return cmds
 
     @staticmethod
-    def _readArgs(ra: Rdr, na: int, dat: bytes, c: int, codes: CmdCodes, word_enc: str) -> list[RArg]:
+    def _readArgs(ra: Rdr, na: int, dat: Buffer, c: int, codes: CmdCodes, word_enc: str) -> list[RArg]:
         match c:
             case codes.IF | codes.ELSE if na == 3:
                 return [RArg.read(ra, word_enc, dat), RArg.read(ra, word_enc), RArg.read(ra, word_enc)]
@@ -97,17 +172,49 @@ class RCmd:
             case _: return [RArg.read(ra, word_enc, dat) for _ in range(na)]
 
 
+def read_sections(src: BinIO | memoryview, off: int, lens: Seq[int], kbs: bytes) -> list[memoryview]:
+    '''consecutive sections from src (a file at off, or a buffer) into one buffer, each at a multiple of 4
+    so that a single cyclic XOR pass decrypts them all, the key restarting at every section'''
+    offs: list[int] = []
+    n = 0
+    for l in lens:
+        offs.append(n)
+        n += l + -l % 4
+    buf = bytearray(n)
+    mbuf = memoryview(buf)
+    for o, l in zip(offs, lens):
+        if isinstance(src, memoryview):
+            assert len(s := src[off:off+l]) == l, f'YSTB: truncated section: want={l}, got={len(s)}, at={off}'
+            mbuf[o:o+l] = s
+            off += l
+        else:
+            assert (got := src.readinto(mbuf[o:o+l])) == l, f'YSTB: truncated section: want={l}, got={got}'  # type: ignore
+    cyclic_xor_in_place(buf, kbs)
+    return [mbuf[o:o+l] for o, l in zip(offs, lens)]
+
+
 @dataclass(slots=True)
 class YSTB:
     ver: int
     key: int
     cmds: list[RCmd]
     codes: CmdCodes
+    exp: memoryview | None = field(default=None, repr=False, compare=False)  # decrypted expression section
 
     @classmethod
-    def read(cls, f: BinIO, codes: CmdCodes, *, key: int | None = None,
+    def read(cls, f: BinIO | Buffer, codes: CmdCodes, *, key: int | None = None,
              v: int | None = None, enc: str = CP932, word_enc: str | None = None):
-        mag, v_, *rest = cast(Ints, SYstbHead.unpack(f.read(32)))
+        v, key, cmds, dexp = cls._read(f, codes, key, v, enc, word_enc)
+        return cls(v, key, cmds, codes, dexp)
+
+    @staticmethod
+    def _read(f: BinIO | Buffer, codes: CmdCodes, key: int | None, v: int | None, enc: str, word_enc: str | None):
+        '''f: a file at the header, or a buffer starting with it (e.g. a view into a mapped YPF)
+        -> ver, key, cmds, decrypted expression section (the args' src views into it)'''
+        src = memoryview(f).cast('B') if isinstance(f, Buffer) else f
+        head = src[:32] if isinstance(src, memoryview) else src.read(32)
+        assert len(head) == 32, f'YSTB: truncated header: {len(head)}'
+        mag, v_, *rest = cast(Ints, SYstbHead.unpack(head))
         assert mag == YstbMagic, f'not YSTB magic: {mag}'
         assert (v := v or v_) in VerRange, f'unsupported version: {v}'
         key = (KEY_290 if v >= 290 else KEY_200) if key is None else key
@@ -117,67 +224,246 @@ class YSTB:
             lcmd, lexp, exp_off, *pads = rest
             assert not any(pads), f'nonzero in padding: {pads}'
             assert 32+lcmd == exp_off  # cpython/issues/133492
-            assert f.readinto(dcmd := bytearray(lcmd)) == lcmd  # type: ignore
-            assert f.readinto(dexp := bytearray(lexp)) == lexp  # type: ignore
-            cyclic_xor_in_place(dcmd, kbs)
-            cyclic_xor_in_place(dexp, kbs)
-            rc = Rdr(dcmd, enc)
+            dcmd, dexp = read_sections(src, 32, (lcmd, lexp), kbs)
+            rc = Rdr(dcmd, enc)  # type: ignore
             cmds: list[RCmd] = []
             while rc.idx < lcmd:
                 cmds.append(RCmd.readV2xx(rc, dexp, v, codes, word_enc))
-            return cls(v, key, cmds, codes)
+            return v, key, cmds, dexp
         ncmd, lcmd, larg, lexp, llno, pad = rest
         assert ncmd * 4 == lcmd == llno
         assert larg % 12 == 0
         assert pad == 0  # cpython/issues/133492
-        assert f.readinto(dcmd := bytearray(lcmd)) == lcmd  # type: ignore
-        assert f.readinto(darg := bytearray(larg)) == larg  # type: ignore
-        assert f.readinto(dexp := bytearray(lexp)) == lexp  # type: ignore
-        assert f.readinto(dlno := bytearray(llno)) == llno  # type: ignore
-        # print('cmd', *map(hex, dcmd[0:16]))
-        # print('arg', *map(hex, darg[0:16]))
-        # print('exp', *map(hex, dexp[0:16]))
-        guess = ','.join(map(hex, dlno[0:16]))
-        cyclic_xor_in_place(dcmd, kbs)
-        cyclic_xor_in_place(darg, kbs)
-        cyclic_xor_in_place(dexp, kbs)
-        cyclic_xor_in_place(dlno, kbs)
-        rc = Rdr(dcmd, enc)
-        ra = Rdr(darg, enc)
-        rl = Rdr(dlno, enc)
+        dcmd, darg, dexp, dlno = read_sections(src, 32, (lcmd, larg, lexp, llno), kbs)
         try:
-            cmds = [RCmd.readV300(rc, ra, rl, dexp, codes, word_enc) for _ in range(ncmd)]
+            cmds = RCmd.readV300Many(dcmd, darg, dlno, dexp, codes, enc, word_enc)
         except Exception as e:
-            e.add_note('lineno guess key: '+guess)
+            e.add_note('lineno guess key: '+','.join(hex(b ^ kbs[i % 4]) for i, b in enumerate(dlno[:16])))
             raise
-        return cls(v, key, cmds, codes)
+        return v, key, cmds, dexp
 
     def print(self, cmds: Seq[MCmd], f: TextIO = stdout, show_idx: bool = True):
-        kcc = self.codes
         f.write(f'YSTB ver={self.ver} key={self.key:0>8x} ncmd={len(self.cmds)}\n')
         for i, cmd in enumerate(self.cmds):
-            code = cmd.code
-            args = cmd.args
-            desc = cmds[cmd.code]
-            darg = desc.args
-            if not show_idx:
-                i = '-'
-            f.write(f'[{i}] off={cmd.off} lno={cmd.lno} npar={cmd.npar} {code}:{desc.name}\n')
-            match code:
-                case kcc.IF | kcc.ELSE if len(args) == 3:
-                    f.write('-  cond: '+repr(args[0])+'\n')
-                    f.write('-  else: '+repr(args[1])+'\n')
-                    f.write('- ifend: '+repr(args[2])+'\n')
-                    continue
-                case kcc.LOOP:
-                    f.write('- count: '+repr(args[0])+'\n')
-                    f.write('- break: '+repr(args[1])+'\n')
-                    continue
-                case kcc.WORD:
-                    assert isinstance(dat := args[0].dat, str)
-                    f.write('# '+dat+'\n')
-                    continue
-                case _: pass
-            for j, arg in enumerate(args):
-                aname = darg[arg.id].name+' ' if arg.id < len(darg) else ''
-                f.write(f'- [{j}] {aname}{repr(arg)}\n')
+            self.print_cmd(cmds, i if show_idx else '-', cmd, f)
+
+    def print_cmd(self, cmds: Seq[MCmd], i: int | str, cmd: 'RCmd | CCmd', f: TextIO = stdout):
+        kcc = self.codes
+        code = cmd.code
+        args = cmd.args
+        desc = cmds[cmd.code]
+        darg = desc.args
+        f.write(f'[{i}] off={cmd.off} lno={cmd.lno} npar={cmd.npar} {code}:{desc.name}\n')
+        match code:
+            case kcc.IF | kcc.ELSE if len(args) == 3:
+                f.write('-  cond: '+repr(args[0])+'\n')
+                f.write('-  else: '+repr(args[1])+'\n')
+                f.write('- ifend: '+repr(args[2])+'\n')
+                return
+            case kcc.LOOP:
+                f.write('- count: '+repr(args[0])+'\n')
+                f.write('- break: '+repr(args[1])+'\n')
+                return
+            case kcc.WORD:
+                assert isinstance(dat := args[0].dat, str)
+                f.write('# '+dat+'\n')
+                return
+            case _: pass
+        for j, arg in enumerate(args):
+            aname = darg[arg.id].name+' ' if arg.id < len(darg) else ''
+            f.write(f'- [{j}] {aname}{repr(arg)}\n')
+
+
+class CArg:
+    '''view of an argument in YSTBC, same attributes as RArg, dat is decoded on every access'''
+    __slots__ = ['t', 'i']
+    t: 'YSTBC'
+    i: int
+
+    def __init__(self, t: 'YSTBC', i: int):
+        self.t, self.i = t, i
+
+    @property
+    def id(self): return self.t.a_id[self.i]
+    @property
+    def typ(self): return Typs[self.t.a_typ[self.i]]
+    @property
+    def aop(self): return AOps[self.t.a_aop[self.i]]
+    @property
+    def siz(self): return self.t.a_siz[self.i]
+    @property
+    def off(self): return self.t.a_off[self.i]
+
+    @property
+    def dat(self) -> None | str | list[TIns]:
+        t, i = self.t, self.i
+        if (kind := t.a_kind[i]) == ArgNone:
+            return None
+        off = t.a_off[i]
+        v = memoryview(t.exp)[off:off+t.a_siz[i]]
+        return str(v, t.word_enc) if kind == ArgWord else many_ins(Rdr(v, t.enc))  # type: ignore
+
+    @property
+    def raw(self) -> tuple[str, bytes] | None:
+        t, i = self.t, self.i
+        if t.a_kind[i] != ArgExpr:
+            return None
+        off = t.a_off[i]
+        return t.enc, t.exp[off:off+t.a_siz[i]]
+
+    def __repr__(self):
+        return (f'RArg(id={self.id!r}, typ={self.typ!r}, aop={self.aop!r}, '
+                f'siz={self.siz!r}, off={self.off!r}, dat={self.dat!r})')
+
+
+class CCmd:
+    '''view of a command in YSTBC, same attributes as RCmd'''
+    __slots__ = ['t', 'i']
+    t: 'YSTBC'
+    i: int
+
+    def __init__(self, t: 'YSTBC', i: int):
+        self.t, self.i = t, i
+
+    @property
+    def off(self): return self.t.c_off[self.i]
+    @property
+    def lno(self): return self.t.c_lno[self.i]
+    @property
+    def code(self): return self.t.c_code[self.i]
+    @property
+    def npar(self): return self.t.c_npar[self.i]
+
+    @property
+    def args(self):
+        t = self.t
+        return [CArg(t, j) for j in range(t.c_arg[self.i], t.c_arg[self.i+1])]
+
+
+class CCmds(Seq[CCmd]):
+    __slots__ = ['t']
+    t: 'YSTBC'
+
+    def __init__(self, t: 'YSTBC'):
+        self.t = t
+
+    def __len__(self): return len(self.t.c_code)
+
+    @overload
+    def __getitem__(self, i: int) -> CCmd: ...
+    @overload
+    def __getitem__(self, i: slice) -> list[CCmd]: ...
+
+    def __getitem__(self, i: int | slice):
+        if isinstance(i, slice):
+            return [CCmd(self.t, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return CCmd(self.t, i)
+
+    def __iter__(self):
+        t = self.t
+        return (CCmd(t, i) for i in range(len(t.c_code)))
+
+
+@dataclass(slots=True)
+class YSTBC:
+    '''Columnar YSTB: commands and arguments in parallel arrays, expressions kept encoded in one
+    shared buffer. cmds gives views with the attributes of RCmd/RArg, for the decompilers.'''
+    ver: int
+    key: int
+    codes: CmdCodes
+    enc: str
+    word_enc: str
+    c_code: array[int]
+    c_npar: array[int]
+    c_lno: array[int]
+    c_off: array[int]
+    c_arg: array[int]  # args of cmd i: c_arg[i]:c_arg[i+1]
+    a_id: array[int]
+    a_typ: array[int]
+    a_aop: array[int]
+    a_kind: array[int]  # ArgNone, ArgExpr, ArgWord
+    a_siz: array[int]
+    a_off: array[int]  # in exp, for args with data
+    exp: bytes
+
+    @property
+    def cmds(self): return CCmds(self)
+
+    @classmethod
+    def read(cls, f: BinIO | Buffer, codes: CmdCodes, *, key: int | None = None,
+             v: int | None = None, enc: str = CP932, word_enc: str | None = None):
+        v, key, cmds, dexp = YSTB._read(f, codes, key, v, enc, word_enc)
+        return cls.of(v, key, codes, cmds, dexp, enc, word_enc or enc)
+
+    @classmethod
+    def of(cls, v: int, key: int, codes: CmdCodes, cmds: Seq[RCmd], dexp: Buffer, enc: str, word_enc: str):
+        '''cmds: just read, with the undecoded args pointing into dexp'''
+        t = cls(v, key, codes, enc, word_enc, array('B'), array('H'), array('I'), array('I'), array('I', [0]),
+                array('H'), array('B'), array('B'), array('B'), array('I'), array('I'), bytes(dexp))
+        mexp = memoryview(dexp)
+        for c in cmds:
+            t.c_code.append(c.code)
+            t.c_npar.append(c.npar)
+            t.c_lno.append(c.lno)
+            t.c_off.append(c.off)
+            for a in c.args:
+                t.a_id.append(a.id)
+                t.a_typ.append(a.typ)
+                t.a_aop.append(a.aop)
+                t.a_siz.append(a.siz)
+                t.a_off.append(a.off)
+                if (src := a.src) is None:
+                    assert a.dat is None, 'YSTBC.of: args must not be decoded yet'
+                    t.a_kind.append(ArgNone)
+                else:
+                    v_, _, word = src
+                    assert v_.obj is mexp.obj, 'YSTBC.of: arg not in dexp'
+                    t.a_kind.append(ArgWord if word else ArgExpr)
+            t.c_arg.append(len(t.a_id))
+        return t
+
+    def cols(self) -> list[array[int]]:
+        return [self.c_code, self.c_npar, self.c_lno, self.c_off, self.c_arg,
+                self.a_id, self.a_typ, self.a_aop, self.a_kind, self.a_siz, self.a_off]
+
+    def write(self, f: BinIO):
+        '''as a file YSTBC.load reads back: header, the encodings (utf-8, tab separated),
+        the columns little endian, exp; command names are not included'''
+        meta = f'{self.enc}\t{self.word_enc}'.encode()
+        f.write(SYstcHead.pack(YstcMagic, self.ver, self.key, len(self.c_code), len(self.a_id),
+                               len(self.exp), len(meta)))
+        f.write(meta)
+        for col in self.cols():
+            if byteorder != 'little':
+                (col := array(col.typecode, col)).byteswap()
+            f.write(col)
+        f.write(self.exp)
+
+    @classmethod
+    def load(cls, f: BinIO | Buffer, codes: CmdCodes):
+        '''codes: of the ysc.ybn the script was read with'''
+        b = memoryview(f).cast('B') if isinstance(f, Buffer) else memoryview(f.read())
+        mag, v, key, ncmd, narg, lexp, lmeta = cast(tuple[bytes, int, int, int, int, int, int],
+                                                    SYstcHead.unpack_from(b))
+        assert mag == YstcMagic, f'not YSTC magic: {mag}'
+        assert len(meta := b[SYstcHead.size:(off := SYstcHead.size+lmeta)]) == lmeta, 'YSTC: truncated meta'
+        enc, word_enc = str(meta, 'utf-8').split('\t')
+        t = cls(v, key, codes, enc, word_enc, array('B'), array('H'), array('I'), array('I'), array('I'),
+                array('H'), array('B'), array('B'), array('B'), array('I'), array('I'), b'')
+        for col, n in zip(t.cols(), (ncmd, ncmd, ncmd, ncmd, ncmd+1, *(narg,)*6)):
+            assert len(part := b[off:off+n*col.itemsize]) == n*col.itemsize, f'YSTC: truncated at {off}'
+            col.frombytes(part)
+            if byteorder != 'little':
+                col.byteswap()
+            off += n*col.itemsize
+        assert len(exp := b[off:off+lexp]) == lexp, f'YSTC: truncated exp at {off}'
+        assert off+lexp == len(b), f'YSTC: {len(b)-off-lexp} bytes after exp, other columns?'
+        t.exp = exp.tobytes()
+        return t
+
+    print = YSTB.print
+    print_cmd = YSTB.print_cmd
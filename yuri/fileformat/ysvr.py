@@ -33,13 +33,13 @@ class Var:
 
     @classmethod
     def _dims_init(cls, r: Rdr, typ: int, ndim: int):
-        dims = [r.ui(4) for _ in range(ndim)]
+        dims = list(r.u32s(ndim))
         match (typ := Typ(typ)):
             case Typ.Unk: init = None
-            case Typ.Int: init = (typ, r.si(8))
+            case Typ.Int: init = (typ, r.i64())
             case Typ.Flt: init = (typ, r.f64())
             case Typ.Str:
-                buf = r.read(r.ui(2)).tobytes()
+                buf = r.read(r.u16()).tobytes()
                 init = (typ, many_ins(Rdr(buf, r.enc)))
         return dims, init
 
@@ -0,0 +1,70 @@
+from os import cpu_count
+from multiprocessing.pool import Pool
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Iterator, Sequence as Seq
+__all__ = ['batches', 'pool_map', 'window_map']
+BatchesPerProc = 4  # the last batches are then small enough not to leave the other workers idle long
+WindowPerThread = 2  # tasks in flight per thread of window_map
+
+
+def batches(sizes: Seq[int], nproc: int, per_proc: int = BatchesPerProc) -> list[list[int]]:
+    '''task indices largest first, cut into runs of about total/(nproc*per_proc) in size:
+    large tasks go alone and early, small ones share a round trip to the worker'''
+    order = sorted(range(len(sizes)), key=lambda i: -sizes[i])
+    cap = sum(sizes)/(nproc*per_proc)
+    out: list[list[int]] = []
+    cur: list[int] = []
+    acc = 0
+    for i in order:
+        if cur and acc+sizes[i] > cap:
+            out.append(cur)
+            cur, acc = [], 0
+        cur.append(i)
+        acc += sizes[i]
+    if cur:
+        out.append(cur)
+    return out
+
+
+def run_batch(arg: tuple[Callable[[Any], Any], list[tuple[int, Any]]]) -> list[tuple[int, Any]]:
+    fn, items = arg
+    return [(i, fn(t)) for i, t in items]
+
+
+def pool_map(pool: Pool, fn: Callable[[Any], Any], tasks: Seq[Any], sizes: Seq[int],
+             nproc: int | None = None) -> list[Any]:
+    '''pool.map(fn, tasks) scheduled by sizes (input bytes) with batches, results in task order;
+    nproc: the pool's processes, None: cpu_count() as Pool() uses'''
+    assert len(sizes) == len(tasks)
+    res: list[Any] = [None]*len(tasks)
+    parts = batches(sizes, nproc or cpu_count() or 1)
+    for part in pool.imap_unordered(run_batch, ((fn, [(i, tasks[i]) for i in b]) for b in parts)):
+        for i, r in part:
+            res[i] = r
+    return res
+
+
+def window_map(ex: Executor, fn: Callable[[Any], Any], tasks: Seq[Any], window: int,
+               sizes: Seq[int] | None = None) -> Iterator[Any]:
+    '''ex.map(fn, tasks) with at most window tasks submitted and not yet consumed, results in task order:
+    memory is bounded by the window, not by len(tasks); sizes: the window is refilled largest first,
+    the task next in order is submitted out of turn (one over the window) when it is not in it yet'''
+    assert window > 0
+    assert sizes is None or len(sizes) == len(tasks)
+    n = len(tasks)
+    order = range(n) if sizes is None else sorted(range(n), key=lambda i: -sizes[i])
+    started = [False]*n
+    futs: dict[int, Future[Any]] = {}
+    k = 0
+
+    def submit(i: int):
+        started[i] = True
+        futs[i] = ex.submit(fn, tasks[i])
+    for i in range(n):
+        while len(futs) < window and k < n:
+            if not started[j := order[k]]:
+                submit(j)
+            k += 1
+        if not started[i]:
+            submit(i)
+        yield futs.pop(i).result()
@@ -7,10 +7,12 @@ from struct import Struct
 from hashlib import sha256
 from typing import NamedTuple
 from multiprocessing import Pool
-from os import walk, path, makedirs
+from concurrent.futures import ThreadPoolExecutor
+from os import walk, path, makedirs, cpu_count
 from xor_cipher import cyclic_xor_in_place
 from .util.custom_encoding import CustomEncoder
-from deflate import zlib_compress, zlib_decompress
+from .util.sched import pool_map, window_map, WindowPerThread
+from .fileformat.ypf import compress, decompress
 __all__ = ['run', 'Typ', 'KEY_200', 'KEY_290']
 YURI_EXT = '.yuri'
 TLinks = list[tuple[list[int], int]]
@@ -71,9 +73,14 @@ def task_compile(arg: tuple[str, str, tuple[dict[str, Typ], bytes], ComCtx]) ->
     return res
 
 
+def ystb_name(iscr: int):
+    return Rf'ysbin\yst{iscr:0>5}.ybn'
+
+
 class LinkCtx(NamedTuple):
     wroot: str
     key: int
+    level: int
 
 
 def task_link(arg: tuple[int, str, TLinks, TAsmV200 | TAsmV300, LinkCtx]) -> YPFEnt:
@@ -81,7 +88,7 @@ def task_link(arg: tuple[int, str, TLinks, TAsmV200 | TAsmV300, LinkCtx]) -> YPF
     hashobj = sha256()
     SHashComp = Struct('<32sb')
     iscr, relpath, links, asm, ctx = arg
-    outpath = Rf'ysbin\yst{iscr:0>5}.ybn'
+    outpath = ystb_name(iscr)
     match asm:
         case (_, a, edat): hashobj.update(a)
         case (_, a, b, edat, c):
@@ -110,7 +117,7 @@ def task_link(arg: tuple[int, str, TLinks, TAsmV200 | TAsmV300, LinkCtx]) -> YPF
     for buf in asm[1:]:
         cyclic_xor_in_place(buf, key_bytes)
     ulen = len(orig_data := b''.join(asm))
-    if len(comp_data := zlib_compress(orig_data, 12)) < ulen:
+    if len(comp_data := compress(orig_data, ctx.level)) < ulen:
         comp = -1
         data = comp_data
     else:
@@ -138,7 +145,9 @@ def run(
     # SysVar:name -> Typ, idx, otherwise only __SysXXX is available
     cdict: dict[str, tuple[Typ, int]] | None = None,
     mp_parallel: bool = True, force_recompile: bool = False,
-    ypf_ver: int | None = None, opts: ComOpts = ComOpts()
+    ypf_ver: int | None = None, opts: ComOpts = ComOpts(),
+    comp_level: int = 12,  # compression level for scripts and ypf
+    comp_nthread: int | None = None,  # threads for link-compress, None: executor default
 ):
     if isinstance(o_enc, CustomEncoder):
         o_enc.register()
@@ -222,7 +231,7 @@ def run(
         com_tasks.append(p)
     if mp_parallel:
         with Pool() as pool:
-            res_list = pool.map(task_compile, com_tasks)
+            res_list = pool_map(pool, task_compile, com_tasks, [path.getsize(t[0]) for t in com_tasks])
     else:
         res_list = [task_compile(t) for t in com_tasks]
     # assign ivar to global, global_f
@@ -258,7 +267,7 @@ def run(
     all_lbls: list[Lbl] = []
     sum_ntxt = sum(res[0] for res in res_list)
     svar_rlim = lvar_idx = sum(res[1] for res in res_list)+len(var_list)
-    link_ctx = LinkCtx(wroot, key)
+    link_ctx = LinkCtx(wroot, key, comp_level)
     link_tasks: list[tuple[int, str, TLinks, TAsmV200 | TAsmV300, LinkCtx]] = []
     for iscr, ((filepath, dirpath, _, _), res) in enumerate(zip(com_tasks, res_list)):
         fvar_dic: dict[str, int] = {}
@@ -293,12 +302,6 @@ def run(
                     var_list.append(Var(VScope.S, sex, iscr, ivar, dims, init))
         link_tasks.append((iscr, relpath, sym_vidxs, asm, link_ctx))
     assert len(var_list) == svar_rlim
-    # Link and Compress
-    if mp_parallel:
-        with Pool() as pool:
-            ypf_ents = pool.map(task_link, link_tasks)
-    else:
-        ypf_ents = [task_link(t) for t in link_tasks]
     # create YSVR, YSLB, YSTL, YSTD, add other files
     all_nvar = lvar_idx
     YSLB.create(yslb_bio := BytesIO(), ver, all_lbls, oe_name, w_ver=w_ver)
@@ -309,7 +312,7 @@ def run(
     yslb_bin = yslb_bio.getvalue()
     ystl_bin = ystl_bio.getvalue()
     ysvr_bin = ysvr_bio.getvalue()
-    ypf_ents.extend((
+    tmpl_ents: list[YPFEnt] = [
         (R'ysbin\ysc.ybn', 0, 1, yscm_bin, len(yscm_bin)),
         (R'ysbin\yscfg.ybn', 0, 1, yscf_bin, len(yscf_bin)),
         (R'ysbin\yse.ybn', 0, 1, yser_bin, len(yser_bin)),
@@ -317,20 +320,34 @@ def run(
         (R'ysbin\yst_list.ybn', 0, 1, ystl_bin, len(ystl_bin)),
         (R'ysbin\yst.ybn', 0, 1, ystd_bin, len(ystd_bin)),
         (R'ysbin\ysv.ybn', 0, 1, ysvr_bin, len(ysvr_bin)),
-    ))
-    # write YPF
-    with open(o_ypf, 'wb') as fp:
-        ypf_make(ypf_ents, ypf_ver or ver, fp, enc=oe_name)
+    ]
 
+    def put(ent: YPFEnt):
+        ypf_w.add(ent)
         # (Optional step: export the recreated ybn files that will go inside the newly created YPF file)
         if o_ybn:
-            for name, _, c, data, uncomp_size in ypf_ents:
-                if c == -1:
-                    data = zlib_decompress(data, uncomp_size)
-                    c = 0
-                full_path = path.join(o_ybn, *name.replace('\\', '/').split('/'))
-                makedirs(path.dirname(full_path), exist_ok=True)
-                print(f'save ybn: {full_path}')
-                # Save the file to the output path
-                with open(full_path, 'wb') as fo:
-                    fo.write(data)
+            name, _, c, data, uncomp_size = ent
+            if c == -1:
+                data = decompress(data, uncomp_size)
+            full_path = path.join(o_ybn, *name.replace('\\', '/').split('/'))
+            makedirs(path.dirname(full_path), exist_ok=True)
+            print(f'save ybn: {full_path}')
+            # Save the file to the output path
+            with open(full_path, 'wb') as fo:
+                fo.write(data)
+    # Link and Compress: threads, the compressor releases the GIL; entries are streamed into the YPF
+    # in order, so that it does not depend on timing, with a bounded number of them in flight,
+    # the largest scripts started first
+    names = [ystb_name(t[0]) for t in link_tasks] + [t[0] for t in tmpl_ents]
+    with open(o_ypf, 'wb') as fp, YPFWriter(fp, ypf_ver or ver, names, enc=oe_name, level=comp_level) as ypf_w:
+        if mp_parallel:
+            nthread = comp_nthread or min(32, (cpu_count() or 1) + 4)  # as ThreadPoolExecutor
+            with ThreadPoolExecutor(nthread) as pool:
+                sizes = [sum(map(len, t[3])) for t in link_tasks]
+                for ent in window_map(pool, task_link, link_tasks, WindowPerThread*nthread, sizes):
+                    put(ent)
+        else:
+            for t in link_tasks:
+                put(task_link(t))
+        for ent in tmpl_ents:
+            put(ent)
@@ -2,16 +2,27 @@ from os import path, makedirs
 from yuri.decompiler import *
 from yuri.fileformat import *
 from multiprocessing import Pool
-from typing import NamedTuple
-__all__ = ['run', 'YDecYuris', 'YDecYuri']
+from yuri.util.sched import pool_map
+from typing import NamedTuple, Iterable, Callable
+from hashlib import sha256
+from fnmatch import fnmatchcase
+import pickle
+import re
+__all__ = ['run', 'read_only', 'YDecYuris', 'YDecYuri']
+# in oroot: hash of the shared inputs and options, iscr -> (script path, ybn hash) of the decompiled scripts
+ManifestName = 'yuridec.manifest'
+TManifest = tuple[bytes, dict[int, tuple[str, bytes]]]
+SharedYbns = ('ysc.ybn', 'ysv.ybn', 'ysl.ybn', 'yst_list.ybn')
+DumpExt = '.ystbc'  # also_dump of a script: YSTBC.write, read back by ystb_query.py with the ysc.ybn copied to oroot
+YstbRef = re.compile(r'(?:ysbin[\\/])?yst(\d{5})\.ybn', re.IGNORECASE)
 
 
 class DecCtx(NamedTuple):
+    iroot: str
+    oroot: str
     cmdcodes: CmdCodes
-    cmds: list[MCmd]
     ydec: YDecBase
     ienc: str
-    opath: str
     ext: str
     oenc: str
     dump: bool
@@ -20,9 +31,20 @@ class DecCtx(NamedTuple):
     word_enc: str | None
 
 
-def task_decompile(arg: tuple[int, str, str, str, DecCtx]):
-    iscr, scrpath, ybnpath, opath, ctx = arg
+WorkerCtx: DecCtx | None = None  # shared by all tasks of a worker, set once by init_worker
+
+
+def init_worker(ctx: DecCtx):
+    global WorkerCtx
+    WorkerCtx = ctx
+
+
+def task_decompile(arg: tuple[int, str]):
+    iscr, scrpath = arg
+    assert (ctx := WorkerCtx) is not None, 'task_decompile: init_worker not called'
     print(iscr, scrpath)
+    ybnpath = f'{ctx.iroot}/yst{iscr:0>5}.ybn'
+    opath = path.join(ctx.oroot, scrpath.replace('\\', '/'))
     with open(ybnpath, 'rb') as fp:
         try:
             ee = None  # dirty
@@ -35,13 +57,60 @@ def task_decompile(arg: tuple[int, str, str, str, DecCtx]):
             e.add_note(scrpath)
             raise
     if ctx.dump:
-        with open(opath+'.dump', 'w', encoding='utf-8') as fp:
-            ystb.print(ctx.cmds, fp)
+        assert ystb.exp is not None
+        enc = ee or ctx.ienc
+        with open(opath+DumpExt, 'wb') as fp:
+            YSTBC.of(ystb.ver, ystb.key, ystb.codes, ystb.cmds, ystb.exp, enc, ctx.word_enc or enc).write(fp)
+    memo = ctx.ydec.memo
+    h0, m0 = memo.hits, memo.misses
     text = ctx.ydec.do_ystb(iscr, ystb)
-    with open(ctx.opath+ctx.ext, 'w', encoding=ctx.oenc, newline='\r\n') as fp:
+    with open(opath+ctx.ext, 'w', encoding=ctx.oenc, newline='\r\n') as fp:
         if ee:
             fp.write(f'ENC = {repr(ee)}\n')
         fp.write(text)
+    return memo.hits-h0, memo.misses-m0
+
+
+def scr_filter(only: Iterable[int | str]) -> Callable[[Scr], bool]:
+    '''ints, digit strings and ybn names (ysbin\\yst00012.ybn) select by iscr,
+    other strings are case-insensitive globs on Scr.path, with / or \\'''
+    iscrs: set[int] = set()
+    pats: list[str] = []
+    for o in only:
+        if isinstance(o, int) or o.isdigit():
+            iscrs.add(int(o))
+        elif m := YstbRef.fullmatch(o):
+            iscrs.add(int(m[1]))
+        else:
+            pats.append(o.replace('\\', '/').lower())
+
+    def want(scr: Scr):
+        if scr.iscr in iscrs:
+            return True
+        p = scr.path.replace('\\', '/').lower()
+        return any(fnmatchcase(p, pat) for pat in pats)
+    return want
+
+
+def read_only(fn: str) -> list[str]:
+    '''a script list for run(only=...), one per line, e.g. what ypf_diff.py writes; # comments'''
+    with open(fn, encoding='utf-8') as fp:
+        return [l for l in map(str.strip, fp) if l and not l.startswith('#')]
+
+
+def load_manifest(oroot: str) -> TManifest | None:
+    try:
+        with open(path.join(oroot, ManifestName), 'rb') as fp:
+            return pickle.load(fp)
+    except FileNotFoundError:
+        return None
+
+
+def yscd_key(yscd: YSCD | None):
+    '''the part of yscd the decompilers use, picklable (YSCD holds memoryviews)'''
+    if yscd is None:
+        return None
+    return yscd.ver, [(v.name, int(v.typ), v.dims) for v in yscd.vars]
 
 
 def run(
@@ -54,48 +123,86 @@ def run(
     mp_parallel: bool = True, also_dump: bool = False,
     key: int | None = None, ver: int | None = None,
     word_enc: str | None = None,
+    force: bool = False,  # redecompile all, instead of only what changed since the last run into oroot
+    only: Iterable[int | str] | None = None,  # just these scripts, see scr_filter
 ):
-    with open(path.join(iroot, 'ysc.ybn'), 'rb') as fp:
-        yscm = YSCM.read(Rdr.from_bio(fp, CP932), v=ver)
-    with open(path.join(iroot, 'ysv.ybn'), 'rb') as fp:
-        ysvr = YSVR.read(Rdr.from_bio(fp, ienc), v=ver)
-    with open(path.join(iroot, 'ysl.ybn'), 'rb') as fp:
-        yslb = YSLB.read(Rdr.from_bio(fp, ienc), v=ver)
-    with open(path.join(iroot, 'yst_list.ybn'), 'rb') as fp:
-        ystl = YSTL.read(Rdr.from_bio(fp, ienc), v=ver)
+    ybns: dict[str, bytes] = {}
+    hshared = sha256(pickle.dumps((dcls.__module__, dcls.__qualname__, ienc, oenc, yscd_key(yscd), also_dump,
+                                   key, ver, word_enc), pickle.HIGHEST_PROTOCOL))
+    for name in SharedYbns:
+        with open(path.join(iroot, name), 'rb') as fp:
+            ybns[name] = fp.read()
+        hshared.update(sha256(ybns[name]).digest())
+    shared = hshared.digest()
+    ystl = YSTL.read(Rdr(ybns['yst_list.ybn'], ienc), v=ver)
+    prev = None if force else load_manifest(oroot)
+    same = prev is not None and prev[0] == shared
+    done = prev[1] if prev is not None and same else {}
+    manifest: dict[int, tuple[str, bytes]] = {}
+    want = None if only is None else scr_filter(only)
     makedirs(oroot, exist_ok=True)
-    if also_dump:
-        with open(path.join(oroot, 'ysc.ybn.dump'), 'w', encoding=oenc) as fp:
-            yscm.print(fp)
-        with open(path.join(oroot, 'ysv.ybn.dump'), 'w', encoding=oenc) as fp:
-            ysvr.print(fp)
-        with open(path.join(oroot, 'ysl.ybn.dump'), 'w', encoding=oenc) as fp:
-            yslb.print(fp)
-        with open(path.join(oroot, 'yst_list.ybn.dump'), 'w', encoding=oenc) as fp:
-            ystl.print(fp)
-    ydec = dcls(yscm, ysvr, yslb, yscd)
-    tasklist: list[tuple[int, str, str, str, DecCtx]] = []
-    oenc = oenc or dcls.DefaultEnc
+    dumps = [n for n in SharedYbns if also_dump and not (same and path.isfile(path.join(oroot, n+'.dump')))]
+    extras: list[tuple[Scr, str, bool]] = []  # scr, opath, write
+    tasklist: list[tuple[int, str]] = []
+    sizes: list[int] = []  # of the ybns, for scheduling
+    nskip = 0
     for scr in ystl.scrs:
+        sel = want is None or want(scr)
         opath = path.join(oroot, scr.path.replace('\\', '/'))
+        if scr.nvar < 0:  # all kept in order, the global file goes to the first non-macro one
+            extras.append((scr, opath, sel and not (same and path.isfile(opath+dcls.ExtraExt))))
+            continue
+        if not sel:
+            if (ent := done.get(scr.iscr)) is not None:
+                manifest[scr.iscr] = ent  # still up to date
+            continue
         makedirs(path.dirname(opath), exist_ok=True)
-        if scr.nvar < 0:
+        with open(f'{iroot}/yst{scr.iscr:0>5}.ybn', 'rb') as fp:
+            manifest[scr.iscr] = ent = (scr.path, sha256(ybn := fp.read()).digest())
+        if done.get(scr.iscr) != ent or not path.isfile(opath+dcls.ExtraExt):
+            tasklist.append((scr.iscr, scr.path))
+            sizes.append(len(ybn))
+        else:
+            nskip += 1
+    if nskip:
+        print(f'{nskip} unchanged scripts skipped')
+    if not (dumps or tasklist or any(write for _, _, write in extras)):
+        return
+    yscm = YSCM.read(Rdr(ybns['ysc.ybn'], CP932), v=ver)
+    ysvr = YSVR.read(Rdr(ybns['ysv.ybn'], ienc), v=ver)
+    yslb = YSLB.read(Rdr(ybns['ysl.ybn'], ienc), v=ver)
+    for name in dumps:
+        obj = {'ysc.ybn': yscm, 'ysv.ybn': ysvr, 'ysl.ybn': yslb, 'yst_list.ybn': ystl}[name]
+        with open(path.join(oroot, name+'.dump'), 'w', encoding=oenc) as fp:
+            obj.print(fp)
+        if name == 'ysc.ybn':  # the command names for the script dumps
+            with open(path.join(oroot, name), 'wb') as fp:
+                fp.write(ybns[name])
+    ydec = dcls(yscm, ysvr, yslb, yscd)
+    oenc = oenc or dcls.DefaultEnc
+    gfile = ydec.out_gfile
+    for scr, opath, write in extras:
+        if gfile and not 'macro' in scr.path.lower():
+            text = gfile
+            gfile = None
+        else:
+            text = ydec.EmptyFile
+        if write:
             print(scr.iscr, scr.path)
-            if ydec.out_gfile and not 'macro' in scr.path.lower():
-                text = ydec.out_gfile
-                ydec.out_gfile = None
-            else:
-                text = ydec.EmptyFile
+            makedirs(path.dirname(opath), exist_ok=True)
             with open(opath+dcls.ExtraExt, 'w', encoding=oenc, newline='\r\n') as fp:
                 fp.write(text)
-        else:
-            ybnpath = f'{iroot}/yst{scr.iscr:0>5}.ybn'
-            ctx = DecCtx(yscm.cmdcodes, yscm.cmds, ydec, ienc, opath,
-                         dcls.ExtraExt, oenc, also_dump, key, ver, word_enc)
-            tasklist.append((scr.iscr, scr.path, ybnpath, opath, ctx))
+    # the context goes to each worker once, tasks only carry the script
+    ctx = DecCtx(iroot, oroot, yscm.cmdcodes, ydec, ienc,
+                 dcls.ExtraExt, oenc, also_dump, key, ver, word_enc)
     if mp_parallel:
-        with Pool() as pool:
-            pool.map(task_decompile, tasklist)
+        with Pool(initializer=init_worker, initargs=(ctx,)) as pool:
+            stats = pool_map(pool, task_decompile, tasklist, sizes)
     else:
-        for task in tasklist:
-            task_decompile(task)
+        init_worker(ctx)
+        stats = [task_decompile(task) for task in tasklist]
+    if (nexpr := sum(h+m for h, m in stats)):
+        hits = sum(h for h, _ in stats)
+        print(f'expressions rendered from memo: {hits}/{nexpr} ({hits/nexpr:.1%})')
+    with open(path.join(oroot, ManifestName), 'wb') as fp:
+        pickle.dump((shared, manifest), fp, pickle.HIGHEST_PROTOCOL)